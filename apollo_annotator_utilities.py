@@ -1,19 +1,25 @@
 #!/usr/bin/env python3
 
 name = 'apollo_annotator_utilities.py'
-version = '0.3.0'
-updated = '2023-06-24'
+version = '0.8.4'
+updated = '2026-10-18'
 
 usage = f"""
 NAME		{name}
 VERSION		{version}
 UPDATED		{updated}
-SYNOPSIS	Interface between Apollo Arrow, Apollo, and the user that minimizes intermidiate steps.
+SYNOPSIS	Interface between python-apollo, Apollo, and the user that minimizes intermidiate steps.
+		Apollo is queried through a single python-apollo client per run, whose requests share a
+		pool of persistent HTTP connections.
 
 REQUIRES	Apollo (https://github.com/GMOD/Apollo)
 		python-apollo (https://github.com/galaxy-genome-annotation/python-apollo)
 		$APOLLO enviromental variable (/path/to/Apollo_distribution)
 
+NOTE		The Apollo server and credentials are read from ~/.apollo-arrow.yml, as set up by
+		'arrow init', or from the file given in $ARROW_GLOBAL_CONFIG_PATH. For offline tests,
+		mock_apollo_server.py provides a local stand-in for the Apollo web services.
+
 ------------------------------------------------------------------------------------------------------------------------
 Add an Organism
 ------------------------------------------------------------------------------------------------------------------------
@@ -47,7 +53,36 @@ COMMAND		{name} --load_annotations \\
 		 -a proteins.long.gff
 
 -i (--id)	Organism ID
--a (--annot)	Annotation gff file
+-a (--annot)	Annotation gff file (can be gzip/bgzip-compressed)
+-b (--batch_size)	Genes loaded per request [Default: 50]
+-j (--connections)	Concurrent connections to Apollo [Default: 4]
+-r (--retries)	Retries of a failed batch, with exponential backoff [Default: 3]
+
+		Genes (top-level features with all their descendants, e.g. mRNAs and their exons)
+		are never split across batches. Loaded batches are checkpointed next to the gff file
+		(.<gff>.<id>.loaded), so an interrupted or failed load resumes where it stopped when
+		run again; the checkpoint is removed once every batch is loaded.
+
+------------------------------------------------------------------------------------------------------------------------
+Sync Annotations
+------------------------------------------------------------------------------------------------------------------------
+
+COMMAND		{name} --sync_annotations \\
+		 -i E_intestinalis_50507 \\
+		 -a proteins.long.gff
+
+-i (--id)	Organism ID
+-a (--annot)	Annotation gff file (can be gzip/bgzip-compressed)
+-b (--batch_size)	Genes loaded, or features deleted, per request [Default: 50]
+-j (--connections)	Concurrent connections to Apollo [Default: 4]
+-r (--retries)	Retries of a failed request, with exponential backoff [Default: 3]
+-d (--dry_run)	Only report the changes
+-o (--overwrite)	Also replace or remove features edited in Apollo
+
+		The organism's current annotations are compared to the gff file by ID (Name), location,
+		strand and exons. Only new and changed genes are loaded, and only features missing from
+		the gff file are deleted. Features edited in Apollo since they were loaded are left
+		untouched unless --overwrite is given.
 
 ------------------------------------------------------------------------------------------------------------------------
 Remove Annotations
@@ -63,15 +98,20 @@ Add a Reference
 ------------------------------------------------------------------------------------------------------------------------
 
 COMMAND		{name} --add_reference \\
-		 -r E_intestinalis_50506.blast.gff \\
+		 -i E_intestinalis_50507 \\
+		 -r E_intestinalis_50506.blast.gff E_intestinalis_50505.blast.gff \\
 		 -t match,match_part \\
-		 -l E_intestinalis_50506 \\
-		 -d -d /media/FatCat/apollo_data/E_intestinalis_50507
+		 -l E_intestinalis_50506 E_intestinalis_50505 \\
+		 -w 2
 
--r (--ref)	Reference gff file
--t (--type)	Reference type (CDS;match,match_part;tRNA)
--l (--label)	Reference label
+-r (--ref)	Reference gff file(s) (can be gzip/bgzip-compressed)
+-t (--type)	Reference type(s) (CDS;match,match_part;tRNA), one for all files or one per file
+-l (--label)	Reference label(s), one per file
 -c (--color)	Track color
+-w (--workers)	Tracks built in parallel [Default: 1]
+
+		Tracks are written directly in the JBrowse NCList format, as flatfile-to-json.pl does,
+		and added to trackList.json under a lock, so that concurrent builds are safe.
 
 ------------------------------------------------------------------------------------------------------------------------
 Remove a Track
@@ -89,11 +129,16 @@ Upload BAM file
 
 COMMAND		{name} --add_bam \\
 
--b (--bam)	BAM file
+-b (--bam)	BAM file (indexed, with its .bai file next to it)
 -l (--label)	BAM label
--t (--type)	Track type (alignment or coverage) [Default: alignment]
--n (--min_cov)	Minimum coverage (Applicable if --type coverage) [Default: 0]
--x (--max_cov)	Maximum coverage (Applicable if --type coverage) [Default: 50]
+-c (--coverage)	Add a read depth (coverage) track instead of an alignment track
+-n (--min_cov)	Minimum coverage (Applicable if --coverage) [Default: lowest depth found]
+-x (--max_cov)	Maximum coverage (Applicable if --coverage) [Default: 99th percentile of the depth of covered bases]
+-w (--workers)	Reference sequences scanned in parallel (Applicable if --coverage) [Default: 4]
+
+		Coverage is computed once from the BAM file and written as a BigWig file ({{label}}.bw),
+		which JBrowse draws at any zoom level without reading the alignments. Requires pysam
+		and pyBigWig.
 
 ------------------------------------------------------------------------------------------------------------------------
 """
@@ -106,9 +151,17 @@ if len(argv) < 2:
 
 from argparse import ArgumentParser
 from subprocess import run
-from os import environ, makedirs
+from os import environ, makedirs, remove
 from os.path import isdir, dirname, isfile, basename
 from shutil import copy
+from time import time
+from multiprocessing import get_context
+import numpy as np
+from apollo_utilities import connect,call,ApolloError,gff3_genes,gene_batches,load_batches
+from apollo_utilities import apollo_features,fetch_features,delete_batches,feature_name,feature_signature,is_curated
+from apollo_utilities import read_loaded,write_loaded
+from jbrowse_utilities import write_track,add_track,bigwig_track
+from bam_utilities import bam_references,depth_runs,depth_histogram,depth_range,write_bigwig
 
 GetOptions = ArgumentParser()
 group = GetOptions.add_mutually_exclusive_group(required=True)
@@ -117,6 +170,7 @@ group.add_argument("--add_organism",default=False,action='store_true')
 group.add_argument("--delete_organism",default=False,action='store_true')
 
 group.add_argument("--load_annotations",default=False,action='store_true')
+group.add_argument("--sync_annotations",default=False,action='store_true')
 group.add_argument("--remove_annotations",default=False,action='store_true')
 
 group.add_argument("--add_reference",default=False,action='store_true')
@@ -126,22 +180,38 @@ group.add_argument("--remove_track",default=False,action='store_true')
 group.add_argument("--add_bam",default=False,action='store_true')
 
 GetOptions.add_argument("-i","--id",required=True)
+GetOptions.add_argument("-j","--connections",type=int,default=4)
 
 args = GetOptions.parse_known_args()[0]
 
 add_org = args.add_organism
 del_org = args.delete_organism
 load_annot = args.load_annotations
+sync_annot = args.sync_annotations
 rem_annot = args.remove_annotations
 add_ref = args.add_reference
 rem_ref = args.remove_track
 add_bam = args.add_bam
 org_id = args.id
+connections = args.connections
 
 APOLLO = environ['APOLLO']
 
 path = f"{APOLLO}/ORGANISMS/{org_id}"
 
+## Record of the annotations loaded by A2A into the organism
+loaded_record = f"{path}/.a2a_loaded"
+
+## One client, and one pool of HTTP connections, for all Apollo requests of the run
+wa = None
+
+if add_org or del_org or load_annot or sync_annot or rem_annot:
+	try:
+		wa = connect(pool_size=connections)
+	except ApolloError as error:
+		print(f"  [E] {error}")
+		exit(1)
+
 if add_org:
 
 	GetOptions = ArgumentParser()
@@ -161,48 +231,351 @@ if add_org:
 
 	run([f"{APOLLO}/web-app/jbrowse/bin/prepare-refseqs.pl","--fasta",fasta,"--out",path])
 
-	run(["arrow","organisms","add_organism","--genus",genus,"--species",species,org_id,path])
+	try:
+		call("add_organism",wa.organisms.add_organism,org_id,path,genus=genus,species=species)
+	except ApolloError as error:
+		print(f"  [E] {error}")
+		exit(1)
 
 if del_org:
 
-	GetOptions = ArgumentParser()
+	try:
+		call("delete_features",wa.organisms.delete_features,org_id)
+		call("delete_organism",wa.organisms.delete_organism,org_id)
+	except ApolloError as error:
+		print(f"  [E] {error}")
+		exit(1)
 
-	run(["arrow","organisms","delete_features",org_id])
-	run(["arrow","organisms","delete_organism",org_id])
+	if isfile(loaded_record):
+		remove(loaded_record)
 
 if load_annot:
 
 	GetOptions = ArgumentParser()
 
 	GetOptions.add_argument("-a","--annot",required=True)
+	GetOptions.add_argument("-b","--batch_size",type=int,default=50)
+	GetOptions.add_argument("-r","--retries",type=int,default=3)
 
 	args = GetOptions.parse_known_args()[0]
 
 	annot = args.annot
+	batch_size = args.batch_size
+	retries = args.retries
+
+	if not isfile(annot):
+		print(f"  [E] Could not find the annotation file {annot}")
+		exit(1)
+
+	genes = gff3_genes(annot)
+	batches = gene_batches(genes,batch_size)
+
+	if not batches:
+		print(f"  [E] No features found in {annot}")
+		exit(1)
+
+	## Keys of the batches already loaded into this organism, and of the operations already
+	## done on batches that failed halfway (<key>:<operation>)
+	checkpoint = f"{dirname(annot) if dirname(annot) else '.'}/.{basename(annot)}.{org_id}.loaded"
+	committed = set()
+
+	if isfile(checkpoint):
+		CHECKPOINT = open(checkpoint,'r')
+		committed = set(line.strip() for line in CHECKPOINT)
+		CHECKPOINT.close()
+
+	pending = [(key,batch) for key,batch in batches if key not in committed]
+	total = sum(len(batch) for key,batch in pending)
+
+	print(f"Loading {len(genes)} gene(s) from {annot} in {len(batches)} batch(es) over {connections} connection(s)")
+
+	if len(pending) < len(batches):
+		print(f"  Resuming: {len(batches) - len(pending)} batch(es) already loaded")
+
+	CHECKPOINT = open(checkpoint,'a')
+
+	## Features loaded by A2A are recorded with the time of their load, so that later edits
+	## in Apollo can be told apart (see --sync_annotations)
+	record = read_loaded(loaded_record)
+	if record is None:
+		record = {}
+
+	start = time()
+	done = 0
+	loaded = 0
+	reported = 0
+	failed = []
+
+	for key,count,features,operations,error in load_batches(wa,org_id,pending,connections,retries,committed):
+
+		loaded += len(features)
+		stamp = int(1000*time())
+		for uniquename in features:
+			record[uniquename] = stamp
+
+		for operation in operations:
+			CHECKPOINT.write(f"{operation}\n")
+		CHECKPOINT.flush()
+
+		if error:
+			failed.append(error)
+			continue
+
+		CHECKPOINT.write(f"{key}\n")
+		CHECKPOINT.flush()
+
+		done += count
+		elapsed = time() - start
+
+		## Progress every 5%
+		if 20*done >= (reported + 1)*total or done == total:
+			reported = 20*done // total
+			print(f"  {done}/{total} genes ({100*done/total:.0f}%), {done/elapsed if elapsed else 0:.1f} genes/s")
+
+	CHECKPOINT.close()
+
+	if not isdir(path):
+		makedirs(path)
+
+	write_loaded(loaded_record,record)
+
+	elapsed = time() - start
 
-	run(['arrow','annotations','load_gff3',org_id,annot])
+	print(f"Loaded {loaded} feature(s) from {done} gene(s) in {elapsed:.1f} s")
+
+	if failed:
+		for error in failed[:10]:
+			print(f"  [E] {error}")
+		print(f"  [E] {len(failed)} batch(es) could not be loaded; run the same command again to resume")
+		exit(1)
+
+	remove(checkpoint)
+
+if sync_annot:
+
+	GetOptions = ArgumentParser()
+
+	GetOptions.add_argument("-a","--annot",required=True)
+	GetOptions.add_argument("-b","--batch_size",type=int,default=50)
+	GetOptions.add_argument("-r","--retries",type=int,default=3)
+	GetOptions.add_argument("-d","--dry_run",default=False,action='store_true')
+	GetOptions.add_argument("-o","--overwrite",default=False,action='store_true')
+
+	args = GetOptions.parse_known_args()[0]
+
+	annot = args.annot
+	batch_size = args.batch_size
+	retries = args.retries
+	dry_run = args.dry_run
+	overwrite = args.overwrite
+
+	if not isfile(annot):
+		print(f"  [E] Could not find the annotation file {annot}")
+		exit(1)
+
+	start = time()
+
+	## Top-level features expected from the gff file, as Apollo stores them (e.g. the mRNAs of
+	## genes): name => [gene number, sequence, signature]
+	genes = gff3_genes(annot)
+	expected = {}
+
+	for number,gene in enumerate(genes):
+		features,transcripts = apollo_features(wa.annotations,[gene])
+		for feature in features + transcripts:
+			expected[feature.get('name') or feature.get('gff_id')] = [number,gene[0],feature_signature(feature)]
+
+	try:
+		sequences = call("get_sequences",wa.organisms.get_sequences,org_id).get('sequences',[])
+	except ApolloError as error:
+		print(f"  [E] {error}")
+		exit(1)
+
+	sequences = sorted(set(sequence['name'] for sequence in sequences) | set(gene[0] for gene in genes))
+
+	print(f"Comparing {len(genes)} gene(s) from {annot} to the annotations of {org_id} on {len(sequences)} sequence(s)")
+
+	## Current features of the organism: name => [(sequence, feature)]
+	current = {}
+
+	for sequence,features,error in fetch_features(wa,org_id,sequences,connections,retries):
+		if error:
+			print(f"  [E] {error}")
+			exit(1)
+		for feature in features:
+			current.setdefault(feature_name(feature),[]).append((sequence,feature))
+
+	## Without a record of what A2A loaded (e.g. organisms loaded with an earlier version), the
+	## features that do not look edited are taken as loaded by A2A
+	record = read_loaded(loaded_record)
+
+	if record is None:
+		record = {feature['uniquename']: feature.get('date_last_modified',0) for features in current.values() for sequence,feature in features if not is_curated(feature)}
+
+	## Genes are added or replaced whole, and a gene is unchanged only if all of its features
+	## are. Apollo features without a counterpart in the gff file, or duplicates of one, are
+	## removed. Features edited in Apollo are kept unless overwritten.
+	added = set()
+	changed = set()
+
+	for name,(number,sequence,signature) in expected.items():
+		existing = current.get(name,[])
+		if not existing:
+			added.add(number)
+		elif existing[0][0] != sequence or feature_signature(existing[0][1]) != signature:
+			changed.add(number)
+
+	changed -= added
+	unchanged = set(range(len(genes))) - added - changed
+
+	## Features of the genes in Apollo: gene number => [(sequence, feature)]
+	gene_features = {}
+	for name,(number,sequence,signature) in expected.items():
+		gene_features.setdefault(number,[]).extend(current.get(name,[]))
+
+	kept = 0
+
+	for number in sorted(changed):
+		if not overwrite and any(is_curated(feature,record) for sequence,feature in gene_features[number]):
+			changed.remove(number)
+			kept += 1
+
+	## Deletions as (sequence, uniquename, gene number replaced or None)
+	deletions = []
+
+	for number in sorted(changed):
+		for sequence,feature in gene_features[number]:
+			deletions.append((sequence,feature['uniquename'],number))
+
+	for name,features in current.items():
+		if name in expected and expected[name][0] in changed:
+			continue
+		for sequence,feature in (features if name not in expected else features[1:]):
+			if not overwrite and is_curated(feature,record):
+				kept += 1
+			else:
+				deletions.append((sequence,feature['uniquename'],None))
+
+	removed = sum(1 for sequence,uniquename,number in deletions if number is None)
+	errors = []
+
+	if not dry_run and deletions:
+
+		## Deletions come first, so that replaced genes are not duplicated; genes whose old
+		## copy could not be deleted are not loaded again
+		replacing = {uniquename: number for sequence,uniquename,number in deletions}
+
+		batches = []
+		for sequence in sorted(set(deletion[0] for deletion in deletions)):
+			uniquenames = [uniquename for feature_sequence,uniquename,number in deletions if feature_sequence == sequence]
+			batches += [(sequence,uniquenames[i:i+batch_size]) for i in range(0,len(uniquenames),batch_size)]
+
+		for sequence,uniquenames,error in delete_batches(wa,org_id,batches,connections,retries):
+			if error:
+				errors.append(error)
+				for uniquename in uniquenames:
+					if replacing[uniquename] is None:
+						removed -= 1
+					else:
+						changed.discard(replacing[uniquename])
+			else:
+				for uniquename in uniquenames:
+					record.pop(uniquename,None)
+
+	if not dry_run and (added or changed):
+
+		for key,count,features,operations,error in load_batches(wa,org_id,gene_batches([genes[number] for number in sorted(added | changed)],batch_size),connections,retries):
+			stamp = int(1000*time())
+			for uniquename in features:
+				record[uniquename] = stamp
+			if error:
+				errors.append(error)
+
+	if not dry_run:
+		if not isdir(path):
+			makedirs(path)
+		write_loaded(loaded_record,record)
+
+	print(f"Sync summary for {org_id} ({time() - start:.1f} s){' [dry run]' if dry_run else ''}")
+	print(f"  {len(added)} gene(s) added")
+	print(f"  {len(changed)} gene(s) changed")
+	print(f"  {removed} feature(s) removed")
+	print(f"  {len(unchanged)} gene(s) unchanged")
+
+	if kept:
+		print(f"  {kept} gene(s)/feature(s) edited in Apollo left as they are; use --overwrite to replace them")
+
+	if errors:
+		for error in errors[:10]:
+			print(f"  [E] {error}")
+		print(f"  [E] {len(errors)} request(s) failed; run the same command again to finish the sync")
+		exit(1)
 
 if rem_annot:
 
-	run(["arrow","organisms","delete_features",org_id])
+	try:
+		call("delete_features",wa.organisms.delete_features,org_id)
+	except ApolloError as error:
+		print(f"  [E] {error}")
+		exit(1)
+
+	if isfile(loaded_record):
+		remove(loaded_record)
 
 if add_ref:
 
 	GetOptions = ArgumentParser()
 
-	GetOptions.add_argument("-r","--ref",required=True)
-	GetOptions.add_argument("-t","--type",required=True)
-	GetOptions.add_argument("-l","--label",required=True)
+	GetOptions.add_argument("-r","--ref",nargs='+',required=True)
+	GetOptions.add_argument("-t","--type",nargs='+',required=True)
+	GetOptions.add_argument("-l","--label",nargs='+',required=True)
 	GetOptions.add_argument("-c","--color",default='blue')
+	GetOptions.add_argument("-w","--workers",type=int,default=1)
 
 	args = GetOptions.parse_known_args()[0]
 
-	ref = args.ref
-	type = args.type
-	label = args.label
+	refs = args.ref
+	types = args.type
+	labels = args.label
 	color = args.color
+	workers = args.workers
+
+	if len(labels) != len(refs):
+		print(f"  [E] Please provide one label per reference gff file")
+		exit(1)
+
+	if len(types) not in (1,len(refs)):
+		print(f"  [E] Please provide one reference type for all gff files, or one per file")
+		exit(1)
+
+	for ref in refs:
+		if not isfile(ref):
+			print(f"  [E] Could not find the reference file {ref}")
+			exit(1)
+
+	if not isdir(path):
+		makedirs(path)
+
+	def BUILD_TRACK(job):
 
-	run([f'{APOLLO}/web-app/jbrowse/bin/flatfile-to-json.pl','--gff',ref,'--type',type,'--trackLabel',label,'--out',path])#,'--subfeatureClasses',f"{{\"match_part\":\"{color}\"}}"])
+		## Each worker adds its own track to trackList.json as soon as it is built
+		ref,type,label = job
+		start = time()
+		config,count = write_track(path,ref,label,set(type.split(",")))
+		add_track(path,config)
+		return f"  Added track {label}: {count} feature(s) from {ref} in {time() - start:.1f} s"
+
+	jobs = [(ref,types[0] if len(types) == 1 else types[number],labels[number]) for number,ref in enumerate(refs)]
+
+	print(f"Building {len(jobs)} track(s) in {path}")
+
+	if workers > 1 and len(jobs) > 1:
+		with get_context('fork').Pool(min(workers,len(jobs))) as pool:
+			for output in pool.imap_unordered(BUILD_TRACK,jobs):
+				print(output,flush=True)
+	else:
+		for job in jobs:
+			print(BUILD_TRACK(job),flush=True)
 
 if rem_ref:
 
@@ -238,31 +611,65 @@ if add_bam:
 	
 	if not isfile(f"{bam_path}/{bam_name}.bai"):
 		print(f"  [E] Could not find the index file ({bam_name}.bai) for the provided bam file ({bam})")
-
-	copy(bam,f"{path}/")
-	copy(f"{bam_path}/{bam_name}.bai",f"{path}/")
+		exit(1)
 
 	if coverage:
 	
-		GetOptions.add_argument("-n","--minimum",type=int,default=0)
-		GetOptions.add_argument("-x","--maximum",type=int,default=500)
+		GetOptions.add_argument("-n","--min_cov",type=int)
+		GetOptions.add_argument("-x","--max_cov",type=int)
+		GetOptions.add_argument("-w","--workers",type=int,default=4)
 
 		args = GetOptions.parse_known_args()[0]
 
-		minimum = args.minimum
-		maximum = args.maximum
-		
-		run([f"{APOLLO}/web-app/jbrowse/bin/add-bam-track.pl",
-				"--in", f"{path}/trackList.json",
-				"--bam_url", f"{bam_name}",
-				"--label", f"{label}",
-				"--coverage",
-				"--min_score", f"{minimum}",
-				"--max_score", f"{maximum}"])
+		minimum = args.min_cov
+		maximum = args.max_cov
+		workers = args.workers
+
+		def SCAN_REFERENCE(reference):
+
+			## Depth of one reference sequence, with the number of bases at each depth
+			name,length = reference
+			starts,ends,depths = depth_runs(bam,name)
+			return name,starts,ends,depths,depth_histogram(starts,ends,depths,length)
+
+		def SCAN_BAM():
+
+			## Reference sequences are scanned in parallel, but come back in header order as the
+			## BigWig file is written in that order
+			with get_context('fork').Pool(max(1,min(workers,len(references)))) as pool:
+				for name,starts,ends,depths,histogram in pool.imap(SCAN_REFERENCE,references):
+					if len(histogram) > len(distribution):
+						distribution.resize(len(histogram))
+					distribution[:len(histogram)] += histogram
+					yield name,starts,ends,depths
+
+		references = bam_references(bam)
+		distribution = np.zeros(1,dtype=np.int64)
+
+		if not isdir(path):
+			makedirs(path)
+
+		print(f"Computing the coverage of {bam} over {len(references)} reference sequence(s)")
+
+		start = time()
+		write_bigwig(f"{path}/{label}.bw",references,SCAN_BAM())
+		low,high = depth_range(distribution)
+
+		if minimum is None:
+			minimum = low
+		if maximum is None:
+			maximum = high
+
+		add_track(path,bigwig_track(label,f"{label}.bw",minimum,maximum))
+
+		print(f"  Added coverage track {label} ({minimum}-{maximum}x) in {time() - start:.1f} s")
 
 	else:
 
+		copy(bam,f"{path}/")
+		copy(f"{bam_path}/{bam_name}.bai",f"{path}/")
+
 		run([f"{APOLLO}/web-app/jbrowse/bin/add-bam-track.pl",
 				"--in", f"{path}/trackList.json",
 				"--bam_url", f"{bam_name}",
-				"--label", f"{label}"])
\ No newline at end of file
+				"--label", f"{label}"])
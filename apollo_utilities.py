@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+## Shared Apollo web services client for the A2A scripts
+
+name = 'apollo_utilities.py'
+version = '0.2.2'
+updated = '2026-10-18'
+
+from io import StringIO
+from re import sub
+from hashlib import sha256
+from threading import local
+from time import sleep
+from os import replace
+from os.path import isfile
+from concurrent.futures import ThreadPoolExecutor,as_completed
+from file_utilities import open_file
+
+## Connections kept open to the Apollo server, and retries of failed connections
+POOL_SIZE = 8
+CONNECT_RETRIES = 3
+
+## Seconds before an Apollo request is abandoned, and before the first retry of a failed batch
+REQUEST_TIMEOUT = 300
+BACKOFF = 1.0
+
+## Milliseconds by which a feature must have been modified after it was loaded to count as
+## edited in Apollo, allowing for Apollo's own updates during the load
+CURATION_TOLERANCE = 60000
+
+class ApolloError(RuntimeError):
+
+	## Raised when an Apollo request fails or Apollo reports an error
+
+	def __init__(self,operation,message):
+		super().__init__(operation,message)
+		self.operation = operation
+		self.message = message
+
+	def __str__(self):
+		return f"Apollo {self.operation} failed: {self.message}"
+
+def connect(instance=None,pool_size=POOL_SIZE):
+
+	## Returns a python-apollo client for an instance of ~/.apollo-arrow.yml (or of the file
+	## in $ARROW_GLOBAL_CONFIG_PATH), the same configuration used by the arrow command line.
+	## python-apollo sends each request through the module-level requests.post/get, opening a
+	## new connection every time; these are routed through a single session instead, so that
+	## all requests of a run reuse a pool of keep-alive connections.
+
+	## Imported here, as python-apollo is not needed for the JBrowse track operations
+	import apollo.client
+	from apollo import ApolloInstance
+	from arrow.apollo import get_instance
+	from requests import Session
+	from requests.adapters import HTTPAdapter
+
+	try:
+		config = get_instance(instance)
+	except Exception as error:
+		raise ApolloError("configuration",str(error))
+
+	if not config:
+		raise ApolloError("configuration","no Apollo instance found; please set up ~/.apollo-arrow.yml (see 'arrow init')")
+
+	session = Session()
+	adapter = HTTPAdapter(pool_connections=pool_size,pool_maxsize=pool_size,max_retries=CONNECT_RETRIES)
+	session.mount("http://",adapter)
+	session.mount("https://",adapter)
+
+	apollo.client.requests = session
+
+	return ApolloInstance(config['url'].rstrip("/"),config['username'],config['password'])
+
+def call(operation,method,*args,**kwargs):
+
+	## Runs a python-apollo method, raising ApolloError if the request fails or if Apollo
+	## answers with an error
+
+	try:
+		response = method(*args,**kwargs)
+	except Exception as error:
+		## python-apollo reports server errors over several lines
+		message = " ".join(line.strip(" \t-") for line in str(error).split("\n") if line.strip())
+		raise ApolloError(operation,message)
+
+	if isinstance(response,dict) and 'error' in response:
+		raise ApolloError(operation,response['error'])
+
+	return response
+
+def gff3_genes(file):
+
+	## Groups the features of a GFF3 file into genes: each top-level feature (without Parent)
+	## with all of its descendants, e.g. a gene with its mRNAs, exons and CDSs. Returns a list
+	## of [sequence, type of the top-level feature, ID, lines] in file order; children listed
+	## before their parent are placed with it. Stops at a ##FASTA section.
+
+	genes = {}
+	roots = {}
+	unnamed = 0
+
+	GFF = open_file(file,'r')
+
+	for line in GFF:
+
+		if line.startswith("##FASTA"):
+			break
+
+		if line.startswith("#") or not line.strip():
+			continue
+
+		data = line.rstrip("\n").split("\t")
+
+		if len(data) < 9:
+			continue
+
+		attributes = dict(field.split("=",1) for field in data[8].strip().strip(";").split(";") if "=" in field)
+		feature_id = attributes.get('ID')
+		parents = attributes.get('Parent')
+
+		if parents:
+			parent = parents.split(",")[0]
+			root = roots.get(parent,parent)
+		elif feature_id:
+			root = feature_id
+		else:
+			unnamed += 1
+			root = f"unnamed_{unnamed}"
+
+		if feature_id:
+			roots[feature_id] = root
+
+		if root not in genes:
+			genes[root] = [data[0],None,root,[]]
+
+		if not parents:
+			genes[root][0] = data[0]
+			genes[root][1] = data[2]
+
+		genes[root][3].append(line if line.endswith("\n") else line + "\n")
+
+	GFF.close()
+
+	return list(genes.values())
+
+def gene_batches(genes,batch_size):
+
+	## Splits genes into batches of at most batch_size genes, each on a single sequence and
+	## with a single type of top-level feature, as python-apollo expects. Every batch gets a
+	## key from its content, used to checkpoint loads.
+
+	batches = []
+	current = []
+
+	for gene in genes:
+
+		if current and (len(current) == batch_size or gene[0] != current[0][0] or gene[1] != current[0][1]):
+			batches.append(current)
+			current = []
+
+		current.append(gene)
+
+	if current:
+		batches.append(current)
+
+	return [(sha256("".join(line for gene in batch for line in gene[3]).encode()).hexdigest(),batch) for batch in batches]
+
+def apollo_features(client,batch):
+
+	## Apollo JSON of a batch of genes, converted as python-apollo's load_gff3 does:
+	## ([top-level features], [transcripts])
+
+	from BCBio import GFF
+
+	features = []
+	transcripts = []
+
+	for record in GFF.parse(StringIO("".join(line for gene in batch for line in gene[3]))):
+		processed = client._process_gff_entry(record)
+		features += processed['top-level']
+		transcripts += processed['transcripts']
+
+	return features,transcripts
+
+def retry(operation,method,retries,*args,**kwargs):
+
+	## call() with up to retries retries, waiting BACKOFF seconds before the first retry and
+	## twice as long before each of the next ones. Raises the last ApolloError.
+
+	for attempt in range(retries + 1):
+		try:
+			return call(operation,method,*args,**kwargs)
+		except ApolloError:
+			if attempt == retries:
+				raise
+			sleep(BACKOFF * 2**attempt)
+
+def annotation_client(wa,clients):
+
+	## python-apollo keeps the current organism and sequence on its annotation client, so
+	## each worker thread gets its own client from clients (a threading.local), all sharing
+	## the connection pool
+
+	from apollo.annotations import AnnotationsClient
+
+	if not hasattr(clients,'client'):
+		clients.client = AnnotationsClient(wa,timeout=REQUEST_TIMEOUT)
+
+	return clients.client
+
+def load_batches(wa,organism,batches,connections=4,retries=3,committed=frozenset()):
+
+	## Loads batches of genes into an organism over a bounded pool of concurrent connections,
+	## retrying failed batches with exponential backoff. Each batch is loaded in two operations,
+	## add_features then add_transcripts, checkpointed as <key>:<operation>; operations listed
+	## in committed were already done and are skipped, so that resuming a batch that failed
+	## halfway does not add its features twice. Yields (key, number of genes, unique names of
+	## the top-level features loaded, operations done, error) as batches complete, error being
+	## None on success. Features loaded before an error are listed too, as they are in Apollo.
+
+	clients = local()
+
+	def LOAD(key,batch):
+
+		client = annotation_client(wa,clients)
+		sequence = batch[0][0]
+
+		try:
+			features,transcripts = apollo_features(client,batch)
+		except Exception as error:
+			return key,len(batch),[],[],ApolloError("GFF3 conversion",str(error))
+
+		## Features and transcripts are retried separately, so that a failure on the
+		## transcripts does not add the features twice
+		loaded = []
+		done = []
+
+		for operation,method,data in (("add_features",client.add_features,features),("add_transcripts",client.add_transcripts,transcripts)):
+
+			if not data or f"{key}:{operation}" in committed:
+				continue
+
+			try:
+				loaded += [feature['uniquename'] for feature in retry(operation,method,retries,data,organism=organism,sequence=sequence).get('features',[])]
+			except ApolloError as error:
+				return key,len(batch),loaded,done,error
+
+			done.append(f"{key}:{operation}")
+
+		return key,len(batch),loaded,done,None
+
+	with ThreadPoolExecutor(max_workers=connections) as executor:
+		jobs = [executor.submit(LOAD,key,batch) for key,batch in batches]
+		for job in as_completed(jobs):
+			yield job.result()
+
+def fetch_features(wa,organism,sequences,connections=4,retries=3):
+
+	## Current top-level features of an organism on each sequence, fetched concurrently.
+	## Yields (sequence, features, error) as sequences complete.
+
+	clients = local()
+
+	def FETCH(sequence):
+
+		client = annotation_client(wa,clients)
+
+		try:
+			return sequence,retry("get_features",client.get_features,retries,organism=organism,sequence=sequence).get('features',[]),None
+		except ApolloError as error:
+			return sequence,[],error
+
+	with ThreadPoolExecutor(max_workers=connections) as executor:
+		jobs = [executor.submit(FETCH,sequence) for sequence in sequences]
+		for job in as_completed(jobs):
+			yield job.result()
+
+def delete_batches(wa,organism,batches,connections=4,retries=3):
+
+	## Deletes batches of features, given as (sequence, [uniquenames]), concurrently. Yields
+	## (sequence, uniquenames, error) as batches complete.
+
+	clients = local()
+
+	def DELETE(sequence,uniquenames):
+
+		client = annotation_client(wa,clients)
+
+		## As python-apollo's delete_feature, for several features per request
+		data = {'features': [{'uniquename': uniquename} for uniquename in uniquenames]}
+
+		try:
+			retry("delete_features",client.post,retries,'deleteFeature',client._update_data(data,organism,sequence))
+			return sequence,uniquenames,None
+		except ApolloError as error:
+			return sequence,uniquenames,error
+
+	with ThreadPoolExecutor(max_workers=connections) as executor:
+		jobs = [executor.submit(DELETE,sequence,uniquenames) for sequence,uniquenames in batches]
+		for job in as_completed(jobs):
+			yield job.result()
+
+def feature_name(feature):
+
+	## Name of an Apollo feature as given in the GFF3; unless loaded with use_name, Apollo
+	## appends a number to it (e.g. 1_1_mRNA-00001)
+
+	return sub(r"-\d{5}$","",feature.get('name',''))
+
+def feature_signature(feature):
+
+	## What a feature is compared on: its location and strand, and those of its exons
+
+	location = feature['location']
+	exons = sorted((child['location']['fmin'],child['location']['fmax']) for child in feature.get('children',[]) if child['type']['name'] == 'exon')
+
+	return (location['fmin'],location['fmax'],location['strand'],tuple(exons))
+
+def read_loaded(file):
+
+	## Record of the features loaded by A2A into an organism: uniquename => time of the load,
+	## in milliseconds. None if there is no record.
+
+	if not isfile(file):
+		return None
+
+	loaded = {}
+
+	LOADED = open(file,'r')
+	for line in LOADED:
+		uniquename,stamp = line.rstrip("\n").split("\t")
+		loaded[uniquename] = int(stamp)
+	LOADED.close()
+
+	return loaded
+
+def write_loaded(file,loaded):
+
+	## Replaces the record of the features loaded by A2A into an organism
+
+	LOADED = open(f"{file}.partial",'w')
+	for uniquename,stamp in loaded.items():
+		LOADED.write(f"{uniquename}\t{stamp}\n")
+	LOADED.close()
+
+	replace(f"{file}.partial",file)
+
+def is_curated(feature,loaded=None):
+
+	## Whether a feature was edited in Apollo. Apollo updates features while it loads them
+	## (e.g. when adding their exons), so their modification date is compared to the time A2A
+	## loaded them, from the record loaded (see read_loaded). Features missing from a record
+	## were created in Apollo. Without a record, a feature counts as edited if it was modified
+	## well after its creation.
+
+	modified = feature.get('date_last_modified')
+
+	if modified is None:
+		return False
+
+	if loaded is not None:
+		if feature['uniquename'] not in loaded:
+			return True
+		return modified > loaded[feature['uniquename']] + CURATION_TOLERANCE
+
+	created = feature.get('date_creation')
+
+	return created is not None and modified - created > CURATION_TOLERANCE
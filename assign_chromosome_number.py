@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = "assign_chromosome_number.py"
-version = "0.1.1"
-updated = "2023-05-20"
+version = "0.1.4"
+updated = "2026-10-18"
 
 usage = f"""
 NAME		{name}
@@ -20,6 +20,10 @@ OPTIONS
 -m (--map)		Chromosome map file
 -f (--fasta)	Assembly FASTA file
 -o (--outdir)	Output directory [Default = CHROMOSOME_ASSIGNMENT]
+-w (--width)	Line width of output FASTA file [Default = 60]
+-z (--bgzip)	Write a bgzip-compressed FASTA file
+
+NOTE		The map and FASTA files can be gzip/bgzip-compressed
 
 """
 
@@ -32,38 +36,35 @@ if len(argv) < 2:
 from argparse import ArgumentParser
 from os import makedirs
 from os.path import isdir,basename
-from textwrap import wrap
+from fasta_utilities import read_fasta,write_fasta
+from file_utilities import open_file
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-m","--map",required=True)
 GetOptions.add_argument("-f","--fasta",required=True)
 GetOptions.add_argument("-o","--outdir",default="CHROMOSOME_ASSIGNMENT")
+GetOptions.add_argument("-w","--width",default=60,type=int)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
 map_file = args.map
 fasta_file = args.fasta
 outdir = args.outdir
+width = args.width
+compressed = ".gz" if args.bgzip else ""
 
 if not isdir(outdir):
 	makedirs(outdir,mode=0o755)
 
 filename = basename(fasta_file).split(".")[0]
 
-FASTA = open(fasta_file,'r')
-locus = ""
 contigs = {}
-for line in FASTA:
-	line = line.strip()
-	if line[0] == ">":
-		locus = line[1:]
-		contigs[locus] = ""
-	else:
-		contigs[locus] += line
-FASTA.close()
-
-MAP = open(map_file,'r')
+for locus,sequence in read_fasta(fasta_file):
+	contigs[locus] = sequence
+
+MAP = open_file(map_file,'r')
 mappings = {}
 mapped_to = ""
 for line in MAP:
@@ -79,14 +80,12 @@ for line in MAP:
 MAP.close()
 
 
-ASSIGNED_FASTA = open(f"{outdir}/{filename}.assigned.fasta",'w')
+ASSIGNED_FASTA = open_file(f"{outdir}/{filename}.assigned.fasta{compressed}",'w')
 ASSIGNMENTS = open(f"{outdir}/{filename}.chromosome_assignments",'w')
 
 for chromosome in sorted(mappings.keys()):
 	for index,contig in enumerate(mappings[chromosome]):
-		ASSIGNED_FASTA.write(f">{chromosome}s{index+1}\n")
-		sequence = "\n".join(wrap(contigs[contig],60))
-		ASSIGNED_FASTA.write(f"{sequence}\n")
+		write_fasta(ASSIGNED_FASTA,f"{chromosome}s{index+1}",contigs[contig],width)
 		ASSIGNMENTS.write(f"{contig} => {chromosome}s{index+1}\n")
 ASSIGNED_FASTA.close()
 ASSIGNMENTS.close()
\ No newline at end of file
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+## Shared BAM coverage handling for the A2A scripts
+
+name = 'bam_utilities.py'
+version = '0.1.2'
+updated = '2026-10-18'
+
+## Read depth is computed once per reference sequence and stored as a BigWig file, whose zoom
+## levels let JBrowse draw coverage at any scale without reading the alignments.
+
+import numpy as np
+
+## Reads skipped when computing depth, as by samtools depth: unmapped (0x4), secondary (0x100),
+## failing quality checks (0x200) and duplicates (0x400)
+SKIPPED_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+
+## Percentile of the depth of covered bases used as the default maximum of coverage tracks
+MAX_PERCENTILE = 99
+
+## Zoom levels written to BigWig files
+ZOOM_LEVELS = 10
+
+## Runs of constant depth written per call to pyBigWig
+WRITE_CHUNK = 1000000
+
+## Aligned blocks of reads buffered before they are added to the depth
+FLUSH_BLOCKS = 1000000
+
+def bam_references(bam):
+
+	## (name, length) of the reference sequences of a BAM file, in header order
+
+	import pysam
+
+	BAM = pysam.AlignmentFile(bam,'rb')
+	references = list(zip(BAM.references,BAM.lengths))
+	BAM.close()
+
+	return references
+
+def depth_runs(bam,reference):
+
+	## Depth of a reference sequence, as runs of constant depth: (starts, ends, depths), 0-based
+	## and end-exclusive, without runs of depth 0. Only aligned bases count, so that deletions
+	## and introns (N) of spliced reads are not covered. Only the positions where the depth
+	## changes are kept, so memory grows with the number of distinct read block boundaries
+	## rather than with the length of the sequence.
+
+	import pysam
+
+	## Sorted positions where the depth changes, and by how much
+	positions = np.zeros(0,dtype=np.int64)
+	changes = np.zeros(0,dtype=np.int64)
+	starts = []
+	ends = []
+
+	def FLUSH(positions,changes,starts,ends):
+
+		## Merges the blocks read so far into the depth changes
+		merged,inverse = np.unique(np.concatenate((positions,np.array(starts,dtype=np.int64),np.array(ends,dtype=np.int64))),return_inverse=True)
+		weights = np.concatenate((changes,np.ones(len(starts),dtype=np.int64),-np.ones(len(ends),dtype=np.int64)))
+		summed = np.bincount(inverse.ravel(),weights=weights,minlength=len(merged)).astype(np.int64)
+		kept = summed != 0
+		return merged[kept],summed[kept]
+
+	BAM = pysam.AlignmentFile(bam,'rb')
+
+	for read in BAM.fetch(reference):
+
+		if read.flag & SKIPPED_FLAGS:
+			continue
+
+		for start,end in read.get_blocks():
+			starts.append(start)
+			ends.append(end)
+
+		## Flushed regularly to bound the memory used by deep BAMs
+		if len(starts) > FLUSH_BLOCKS:
+			positions,changes = FLUSH(positions,changes,starts,ends)
+			starts = []
+			ends = []
+
+	BAM.close()
+
+	if starts:
+		positions,changes = FLUSH(positions,changes,starts,ends)
+
+	## Depth between consecutive change positions
+	depths = np.cumsum(changes)[:-1]
+	covered = depths > 0
+
+	return positions[:-1][covered],positions[1:][covered],depths[covered]
+
+def depth_histogram(starts,ends,depths,length):
+
+	## Number of bases at each depth, 0 included
+
+	histogram = np.bincount(depths,weights=ends - starts).astype(np.int64) if len(depths) else np.zeros(1,dtype=np.int64)
+	histogram[0] += length - (ends - starts).sum()
+
+	return histogram
+
+def depth_range(histogram,percentile=MAX_PERCENTILE):
+
+	## Default (minimum, maximum) of a coverage track: the lowest depth found, and the given
+	## percentile of the depth of covered bases, so that a few very deep regions do not flatten
+	## the rest of the track
+
+	found = np.flatnonzero(histogram)
+	minimum = int(found[0]) if len(found) else 0
+
+	covered = histogram[1:]
+
+	if covered.sum() == 0:
+		return minimum,1
+
+	cumulative = np.cumsum(covered)
+	maximum = int(np.searchsorted(cumulative,cumulative[-1] * percentile / 100)) + 1
+
+	return minimum,max(maximum,minimum + 1)
+
+def write_bigwig(file,references,runs):
+
+	## Writes a BigWig file; references are (name, length) in header order, and runs yields
+	## (name, starts, ends, depths) in the same order
+
+	import pyBigWig
+
+	BW = pyBigWig.open(file,'w')
+	BW.addHeader(references,maxZooms=ZOOM_LEVELS)
+
+	for reference,starts,ends,depths in runs:
+		for offset in range(0,len(starts),WRITE_CHUNK):
+			chunk = slice(offset,offset + WRITE_CHUNK)
+			BW.addEntries([reference] * len(starts[chunk]),starts[chunk].tolist(),ends=ends[chunk].tolist(),values=depths[chunk].astype(float).tolist())
+
+	BW.close()
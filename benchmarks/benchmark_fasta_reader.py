@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+name = 'benchmark_fasta_reader.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Compares the per-line concatenation loop formerly used by the A2A scripts with
+		read_fasta() from fasta_utilities.py on a synthetic assembly.
+
+USAGE		{name} \\
+		  -s 50 \\
+		  -c 20
+
+OPTIONS
+-s (--size)	Assembly size in Mbp [Default: 20]
+-c (--contigs)	Number of contigs [Default: 10]
+-w (--width)	FASTA line width [Default: 60]
+"""
+
+from sys import path
+from os.path import dirname,abspath
+
+path.insert(0,dirname(dirname(abspath(__file__))))
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from random import choice,seed
+from time import perf_counter
+from fasta_utilities import read_fasta
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-s","--size",type=int,default=20)
+GetOptions.add_argument("-c","--contigs",type=int,default=10)
+GetOptions.add_argument("-w","--width",type=int,default=60)
+
+args = GetOptions.parse_args()
+
+size = args.size * 1000000
+contigs = args.contigs
+width = args.width
+
+def legacy_loop(file):
+
+	sequences = {}
+	locus = False
+
+	FASTA = open(file,'r')
+	for line in FASTA:
+		line = line.strip()
+		if line[0] == '>':
+			locus = line[1:]
+			sequences[locus] = ""
+		elif locus:
+			sequences[locus] += line
+	FASTA.close()
+
+	return sequences
+
+def shared_reader(file):
+
+	return {header:sequence for header,sequence in read_fasta(file)}
+
+seed(0)
+unit = "".join(choice("ACGT") for _ in range(1000003))
+
+with TemporaryDirectory() as temp_dir:
+
+	file = f"{temp_dir}/assembly.fasta"
+
+	FASTA = open(file,'w')
+	for index in range(contigs):
+		FASTA.write(f">contig_{index+1}\n")
+		length = size // contigs
+		sequence = (unit * (length // len(unit) + 1))[:length]
+		for start in range(0,length,width):
+			FASTA.write(f"{sequence[start:start+width]}\n")
+	FASTA.close()
+
+	print(f"\n{contigs} contigs, {size/1000000:.0f} Mbp, {width} bp lines\n")
+
+	timings = {}
+
+	for label,reader in [("per-line concatenation",legacy_loop),("read_fasta()",shared_reader)]:
+		start = perf_counter()
+		sequences = reader(file)
+		timings[label] = perf_counter() - start
+		print(f"{label:<24}{timings[label]:>8.2f} s")
+		del sequences
+
+	print(f"\nSpeedup: {timings['per-line concatenation']/timings['read_fasta()']:.1f}x\n")
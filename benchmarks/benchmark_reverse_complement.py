@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+name = 'benchmark_reverse_complement.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Compares the base-by-base reverse complement formerly used by orient_fastas_to_reference.py
+		with the translation table based routines from fasta_utilities.py on a synthetic sequence.
+
+USAGE		{name} \\
+		  -s 50
+
+OPTIONS
+-s (--size)	Sequence size in Mbp [Default: 50]
+"""
+
+from sys import path
+from os.path import dirname,abspath
+
+path.insert(0,dirname(dirname(abspath(__file__))))
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from random import choice,seed
+from time import perf_counter
+from tracemalloc import start,stop,get_traced_memory
+from fasta_utilities import reverse_complement,reverse_complement_chunks,write_fasta
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-s","--size",type=int,default=50)
+
+args = GetOptions.parse_args()
+
+size = args.size * 1000000
+
+def legacy_reverse_complement(sequence):
+
+	bases = {
+		'A':'T','a':'t',
+		'T':'A','t':'a',
+		'C':'G','c':'g',
+		'G':'C','g':'c',
+		'N':'N','n':'n'
+	}
+
+	seq = ""
+
+	for base in sequence[::-1]:
+		seq += bases[base]
+
+	return seq
+
+seed(0)
+unit = "".join(choice("ACGTN") for _ in range(1000003))
+sequence = (unit * (size // len(unit) + 1))[:size]
+
+print(f"\n{size/1000000:.0f} Mbp sequence\n")
+
+timer = perf_counter()
+legacy = legacy_reverse_complement(sequence)
+legacy_time = perf_counter() - timer
+
+timer = perf_counter()
+table = reverse_complement(sequence)
+table_time = perf_counter() - timer
+
+assert legacy == table
+del legacy,table
+
+print(f"{'base by base':<32}{legacy_time:>8.2f} s")
+print(f"{'reverse_complement()':<32}{table_time:>8.2f} s")
+print(f"\nSpeedup: {legacy_time/table_time:.1f}x\n")
+
+with TemporaryDirectory() as temp_dir:
+
+	for label,minus in [("write full copy",lambda: reverse_complement(sequence)),("write chunks",lambda: reverse_complement_chunks(sequence))]:
+
+		OUT = open(f"{temp_dir}/minus.fasta",'w')
+		start()
+		timer = perf_counter()
+		write_fasta(OUT,"minus",minus())
+		elapsed = perf_counter() - timer
+		peak = get_traced_memory()[1]
+		stop()
+		OUT.close()
+
+		print(f"{label:<32}{elapsed:>8.2f} s{peak/1000000:>10.1f} MB peak")
+
+print()
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = 'blast_to_apollo_gff.py'
-version = '0.2.1'
-updated = '2023-05-31'
+version = '0.2.2'
+updated = '2026-10-18'
 
 usage = f"""
 NAME		{name}
@@ -18,6 +18,9 @@ OPTIONS
 -b (--blast)	Tabular BLAST file
 -a (--annots)	Tab-separated file locus-annotation file for the query used
 -o (--output)	Output file [Default: blast.gff3]
+-z (--bgzip)	Write a bgzip-compressed GFF3 file (.gz is added to the output name)
+
+NOTE		The BLAST and annotation files can be gzip/bgzip-compressed
 """
 
 from sys import argv
@@ -28,12 +31,14 @@ if len(argv) < 2:
 
 from argparse import ArgumentParser
 from os.path import basename
+from file_utilities import open_file,strip_compression
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-b","--blast",required=True)
 GetOptions.add_argument("-a","--annots",required=True)
 GetOptions.add_argument("-o","--output",default="blast.gff3")
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
@@ -41,11 +46,14 @@ blast_file = args.blast
 annots_file = args.annots
 output = args.output
 
-basename = basename(blast_file).split(".")
+if args.bgzip and not output.endswith(".gz"):
+	output += ".gz"
+
+basename = basename(strip_compression(blast_file)).split(".")
 filename = basename[0]
 ext = basename[-2]
 
-PRODUCTS = open(annots_file,'r')
+PRODUCTS = open_file(annots_file,'r')
 products = {}
 for line in PRODUCTS:
 	line.strip()
@@ -53,8 +61,8 @@ for line in PRODUCTS:
 	products[locus] = annot.strip()
 PRODUCTS.close()
 
-BLAST = open(blast_file,'r')
-GFF3 = open(output,'w')
+BLAST = open_file(blast_file,'r')
+GFF3 = open_file(output,'w')
 match_num = 1
 for line in BLAST:
 	
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+## Shared BLAST+ handling for the A2A scripts
+
+name = 'blast_utilities.py'
+version = '0.1.5'
+updated = '2026-10-18'
+
+from subprocess import Popen,PIPE
+from tempfile import TemporaryFile
+from threading import Thread
+from shutil import copyfileobj
+from file_utilities import open_file,is_twobit
+from fasta_utilities import read_fasta,write_fasta
+
+## Reported when a BLAST+ program cannot be found
+MISSING = "not found; BLAST+ must be installed and in $PATH"
+
+class BLASTError(RuntimeError):
+
+	## Raised when a BLAST+ program exits with a nonzero status, or cannot be run (returncode
+	## None); carries its stderr
+
+	def __init__(self,command,returncode,stderr):
+		super().__init__(command,returncode,stderr)
+		self.command = command
+		self.returncode = returncode
+		self.stderr = stderr
+
+	def __str__(self):
+		if self.returncode is None:
+			return f"Could not run {self.command[0]}: {self.stderr}"
+		message = f"{self.command[0]} exited with status {self.returncode}"
+		if self.stderr.strip():
+			message += f":\n{self.stderr.strip()}"
+		return message
+
+def feed(process,file):
+
+	## Copies a (possibly compressed) file to the standard input of a process, from a
+	## separate thread so that the process output can be read at the same time. A 2-bit
+	## sequence store is written out as FASTA.
+
+	def copy():
+		INPUT = None if is_twobit(file) else open_file(file,'r')
+		try:
+			if INPUT:
+				copyfileobj(INPUT,process.stdin,1 << 20)
+			else:
+				for header,sequence in read_fasta(file):
+					write_fasta(process.stdin,header,sequence)
+		except BrokenPipeError:
+			pass
+		finally:
+			if INPUT:
+				INPUT.close()
+			try:
+				process.stdin.close()
+			except BrokenPipeError:
+				pass
+
+	thread = Thread(target=copy,daemon=True)
+	thread.start()
+
+	return thread
+
+def stream_blast(command,outfile,stdin=None):
+
+	## Runs a BLAST+ command that writes tabular results to stdout and yields its lines as
+	## they are produced, while copying them to outfile (bgzip-compressed if it ends in .gz).
+	## If stdin is given, that file is decompressed (or unpacked) into the standard input of the program,
+	## e.g. for -query -. Raises BLASTError once the output is exhausted if the program failed.
+
+	ERRORS = TemporaryFile(mode='w+')
+	OUT = open_file(outfile,'w')
+
+	try:
+		process = Popen(command,stdin=PIPE if stdin else None,stdout=PIPE,stderr=ERRORS,text=True)
+	except FileNotFoundError:
+		OUT.close()
+		ERRORS.close()
+		raise BLASTError(command,None,MISSING)
+
+	if stdin:
+		feed(process,stdin)
+
+	try:
+		for line in process.stdout:
+			OUT.write(line)
+			yield line
+	finally:
+		process.stdout.close()
+		OUT.close()
+		returncode = process.wait()
+
+	ERRORS.seek(0)
+	stderr = ERRORS.read()
+	ERRORS.close()
+
+	if returncode != 0:
+		raise BLASTError(command,returncode,stderr)
+
+def run_blast(command):
+
+	## Runs a BLAST+ command to completion. Raises BLASTError if it failed.
+
+	ERRORS = TemporaryFile(mode='w+')
+
+	try:
+		returncode = Popen(command,stdout=ERRORS,stderr=ERRORS,text=True).wait()
+	except FileNotFoundError:
+		ERRORS.close()
+		raise BLASTError(command,None,MISSING)
+
+	ERRORS.seek(0)
+	stderr = ERRORS.read()
+	ERRORS.close()
+
+	if returncode != 0:
+		raise BLASTError(command,returncode,stderr)
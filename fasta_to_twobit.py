@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+name = 'fasta_to_twobit.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Packs FASTA files into 2-bit sequence stores (.a2bit). Bases are stored 4 per byte,
+		with runs of N/IUPAC codes and soft-masked (lowercase) regions kept on the side, so
+		that sequences are restored exactly. Stores are memory-mapped by the A2A scripts,
+		giving random access to any sequence or region without parsing.
+
+USAGE		{name} \\
+		  -f *.fasta \\
+		  -o STORES
+
+OPTIONS
+-f (--fasta)	FASTA file(s) to pack
+-o (--outdir)	Output directory [Default: ./]
+
+NOTE		Input FASTA files can be gzip/bgzip-compressed. Stores are named after the FASTA
+		files, e.g. genome.fasta.gz => genome.a2bit
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from os import makedirs
+from os.path import isdir,basename,getsize
+from fasta_utilities import read_fasta
+from file_utilities import strip_compression
+from twobit_utilities import write_twobit,EXTENSION
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-f","--fasta",nargs='+',required=True)
+GetOptions.add_argument("-o","--outdir",default='./')
+
+args = GetOptions.parse_args()
+
+fastas = args.fasta
+outdir = args.outdir
+
+if not isdir(outdir):
+	makedirs(outdir,mode=0o755)
+
+for fasta in fastas:
+
+	filename = basename(strip_compression(fasta))
+	prefix = filename.rsplit(".",1)[0] if "." in filename else filename
+	store = f"{outdir}/{prefix}{EXTENSION}"
+
+	print(f"Packing {fasta} into {store}")
+
+	write_twobit(store,read_fasta(fasta))
+
+	print(f"  {getsize(store)} bytes")
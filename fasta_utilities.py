@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+## Shared FASTA handling for the A2A scripts
+
+name = 'fasta_utilities.py'
+version = '0.1.4'
+updated = '2026-10-18'
+
+from file_utilities import open_file,is_twobit
+
+## Characters read from disk at a time
+BLOCK_SIZE = 1 << 24
+
+def read_fasta(file,block_size=BLOCK_SIZE):
+
+	## Yields (header,sequence) for every record of a FASTA file, one record at a time.
+	## The header is the definition line without the leading '>' and trailing whitespace.
+	## Sequence lines are read in large blocks and each sequence is built with a single
+	## join, so parsing is linear in file size. Blank lines and CRLF line endings are
+	## ignored, as is anything before the first header. Compressed files and 2-bit sequence
+	## stores (see twobit_utilities.py) are supported.
+
+	if is_twobit(file):
+		## Imported here, so that reading plain FASTA files does not import NumPy, which
+		## twobit_utilities needs
+		from twobit_utilities import read_twobit
+		yield from read_twobit(file)
+		return
+
+	header = None
+	pieces = []
+	leftover = ''
+
+	FASTA = open_file(file,'r')
+
+	while True:
+
+		block = FASTA.read(block_size)
+
+		## Only a header cut by the end of a block is carried over; a cut sequence line
+		## simply continues the current record in the next block
+		text = leftover + block
+		leftover = ''
+
+		position = 0
+		size = len(text)
+
+		while position < size:
+
+			if text[position] == '>':
+
+				end = text.find('\n',position)
+
+				if end < 0:
+					if block:
+						leftover = text[position:]
+						break
+					end = size
+
+				if header is not None:
+					yield header,''.join(pieces)
+
+				header = text[position+1:end].rstrip()
+				pieces = []
+				position = end + 1
+
+			else:
+
+				stop = text.find('\n>',position)
+				stop = size if stop < 0 else stop + 1
+
+				if header is not None:
+					pieces.extend(text[position:stop].split())
+
+				position = stop
+
+		if not block:
+			break
+
+	FASTA.close()
+
+	if header is not None:
+		yield header,''.join(pieces)
+
+## Sequence lines joined per write() call
+LINES_PER_WRITE = 1 << 14
+
+def write_sequence(OUT,sequence,width=60):
+
+	## Writes a sequence as lines of width characters by slicing, a block of lines at a
+	## time, so the whole wrapped sequence is never built in memory. The output is the
+	## same as "\n".join(textwrap.wrap(sequence,width)) followed by a newline.
+
+	if not sequence:
+		OUT.write("\n")
+		return
+
+	step = width * LINES_PER_WRITE
+
+	for start in range(0,len(sequence),step):
+		block = sequence[start:start+step]
+		OUT.write("\n".join([block[x:x+width] for x in range(0,len(block),width)]))
+		OUT.write("\n")
+
+def write_chunks(OUT,chunks,width=60):
+
+	## Same output as write_sequence() for a sequence supplied as consecutive pieces of any
+	## size, e.g. from reverse_complement_chunks()
+
+	carry = ''
+	written = False
+
+	for chunk in chunks:
+
+		block = carry + chunk
+		cut = len(block) - len(block) % width
+
+		if cut:
+			OUT.write("\n".join([block[x:x+width] for x in range(0,cut,width)]))
+			OUT.write("\n")
+			written = True
+
+		carry = block[cut:]
+
+	if carry or not written:
+		OUT.write(f"{carry}\n")
+
+def write_fasta(OUT,header,sequence,width=60):
+
+	OUT.write(f">{header}\n")
+
+	if isinstance(sequence,str):
+		write_sequence(OUT,sequence,width)
+	else:
+		write_chunks(OUT,sequence,width)
+
+## IUPAC nucleotide complements; other characters (gaps, masking) are left as is
+COMPLEMENT = str.maketrans(
+	'ACGTUNRYKMSWBDHVacgtunrykmswbdhv',
+	'TGCAANYRMKSWVHDBtgcaanyrmkswvhdb'
+)
+
+## Bases reverse complemented at a time by reverse_complement_chunks()
+CHUNK_SIZE = 1 << 20
+
+def reverse_complement(sequence):
+
+	return sequence.translate(COMPLEMENT)[::-1]
+
+def reverse_complement_chunks(sequence,chunk_size=CHUNK_SIZE):
+
+	## Yields the reverse complement of a sequence chunk_size bases at a time, starting from
+	## its end, so that it can be written without a second full copy of the sequence
+
+	for end in range(len(sequence),0,-chunk_size):
+		yield sequence[max(0,end-chunk_size):end].translate(COMPLEMENT)[::-1]
+
+WHITESPACE = b' \t\r\n\x0b\x0c'
+
+def index_fasta(file,block_size=BLOCK_SIZE):
+
+	## Yields (header,start,end,length) for every record of an uncompressed FASTA file
+	## without keeping any sequence: start and end are the byte offsets delimiting the
+	## sequence lines of the record, and length is its number of residues
+
+	header = None
+	start = 0
+	length = 0
+	leftover = b''
+
+	## Byte offset in the file of the first character of text
+	base = 0
+
+	FASTA = open(file,'rb')
+
+	while True:
+
+		block = FASTA.read(block_size)
+
+		text = leftover + block
+		leftover = b''
+
+		position = 0
+		size = len(text)
+
+		while position < size:
+
+			if text[position] == 62:
+
+				end = text.find(b'\n',position)
+
+				if end < 0:
+					if block:
+						leftover = text[position:]
+						break
+					end = size
+
+				if header is not None:
+					yield header,start,base+position,length
+
+				header = text[position+1:end].decode().rstrip()
+				start = base + end + 1
+				length = 0
+				position = end + 1
+
+			else:
+
+				stop = text.find(b'\n>',position)
+				stop = size if stop < 0 else stop + 1
+
+				if header is not None:
+					length += len(text[position:stop].translate(None,WHITESPACE))
+
+				position = stop
+
+		base += size - len(leftover)
+
+		if not block:
+			break
+
+	FASTA.close()
+
+	if header is not None:
+		yield header,start,max(start,base),length
+
+def read_record(FASTA,start,end,block_size=BLOCK_SIZE):
+
+	## Yields the sequence lines between two byte offsets of a FASTA file opened in binary
+	## mode, as whitespace-free chunks of at most block_size characters
+
+	FASTA.seek(start)
+	remaining = end - start
+
+	while remaining > 0:
+
+		data = FASTA.read(min(block_size,remaining))
+
+		if not data:
+			break
+
+		remaining -= len(data)
+
+		yield data.translate(None,WHITESPACE).decode()
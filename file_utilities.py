@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+## Transparent gzip/bgzip input and output for the A2A scripts
+
+name = 'file_utilities.py'
+version = '0.1.1'
+updated = '2026-10-18'
+
+from io import TextIOWrapper,BufferedWriter,RawIOBase
+from os import cpu_count
+from shutil import which
+from subprocess import Popen,PIPE
+from concurrent.futures import ThreadPoolExecutor
+from struct import pack
+from zlib import compressobj,crc32,DEFLATED
+import gzip
+
+## Threads used to compress and decompress
+THREADS = min(8,cpu_count() or 1)
+
+COMPRESSED_EXTENSIONS = ('.gz','.bgz')
+
+## First bytes of a 2-bit sequence store (see twobit_utilities.py)
+TWOBIT_MAGIC = b'A2A2BIT\x01'
+
+def is_compressed(file):
+
+	## gzip and bgzip files are recognised by their magic number, whatever their name
+
+	FILE = open(file,'rb')
+	magic = FILE.read(2)
+	FILE.close()
+
+	return magic == b'\x1f\x8b'
+
+def is_twobit(file):
+
+	## 2-bit sequence stores are recognised by their magic number, without importing
+	## twobit_utilities and NumPy
+
+	FILE = open(file,'rb')
+	magic = FILE.read(len(TWOBIT_MAGIC))
+	FILE.close()
+
+	return magic == TWOBIT_MAGIC
+
+def strip_compression(file):
+
+	## Name of a file without its .gz/.bgz extension
+
+	for extension in COMPRESSED_EXTENSIONS:
+		if file.endswith(extension):
+			return file[:-len(extension)]
+
+	return file
+
+def open_file(file,mode='r',threads=THREADS):
+
+	## Opens a text file for reading ('r') or writing ('w'). Compressed inputs are
+	## decompressed as they are read, by bgzip or pigz in a separate process when either
+	## is installed, else by the gzip module. Outputs whose name ends in .gz or .bgz are
+	## written in the BGZF format of bgzip.
+
+	if mode == 'r':
+
+		if not is_compressed(file):
+			return open(file,'r')
+
+		for tool,option in (('bgzip','-@'),('pigz','-p')):
+			if which(tool):
+				return DecompressedStream([tool,'-dc',option,str(threads),file])
+
+		return gzip.open(file,'rt')
+
+	if mode == 'w':
+
+		if not file.endswith(COMPRESSED_EXTENSIONS):
+			return open(file,'w')
+
+		return TextIOWrapper(BufferedWriter(BgzfWriter(file,threads),BGZF_BLOCK_SIZE))
+
+	raise ValueError(f"Unsupported mode '{mode}'")
+
+class DecompressedStream(TextIOWrapper):
+
+	## Standard output of a decompressor process, read as a regular file
+
+	def __init__(self,command):
+
+		self.command = command
+		self.process = Popen(command,stdout=PIPE)
+
+		super().__init__(self.process.stdout)
+
+	def close(self):
+
+		if self.closed:
+			return
+
+		super().close()
+
+		## A negative status means the decompressor was stopped by SIGPIPE because
+		## the file was not read to the end, which is not an error
+		if self.process.wait() > 0:
+			raise OSError(f"{self.command[0]} failed to decompress {self.command[-1]}")
+
+## BGZF blocks hold at most 64 kb of uncompressed data
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+def bgzf_block(data):
+
+	## One BGZF block: a gzip member with a BC extra field holding the block size
+
+	compressor = compressobj(6,DEFLATED,-15)
+	deflated = compressor.compress(data) + compressor.flush()
+
+	header = pack('<4BI2BH2BHH',0x1f,0x8b,8,4,0,0,0xff,6,ord('B'),ord('C'),2,len(deflated) + 25)
+	trailer = pack('<II',crc32(data) & 0xffffffff,len(data))
+
+	return header + deflated + trailer
+
+class BgzfWriter(RawIOBase):
+
+	## Raw binary file writing BGZF, the blocked gzip format of bgzip. Blocks are
+	## compressed concurrently by a thread pool, as zlib releases the GIL.
+
+	def __init__(self,file,threads=THREADS):
+
+		super().__init__()
+
+		self.FILE = open(file,'wb')
+		self.threads = max(1,threads)
+		self.pool = ThreadPoolExecutor(self.threads)
+		self.pending = bytearray()
+
+	def writable(self):
+
+		return True
+
+	def write(self,data):
+
+		self.pending += data
+
+		## Blocks are compressed in batches of several per thread to keep the pool busy
+		if len(self.pending) >= BGZF_BLOCK_SIZE * self.threads * 4:
+			cut = len(self.pending) - len(self.pending) % BGZF_BLOCK_SIZE
+			self.compress(self.pending[:cut])
+			del self.pending[:cut]
+
+		return len(data)
+
+	def compress(self,data):
+
+		blocks = [bytes(data[x:x+BGZF_BLOCK_SIZE]) for x in range(0,len(data),BGZF_BLOCK_SIZE)]
+
+		for block in self.pool.map(bgzf_block,blocks):
+			self.FILE.write(block)
+
+	def close(self):
+
+		if self.closed:
+			return
+
+		self.compress(self.pending)
+		self.pending = bytearray()
+
+		self.FILE.write(BGZF_EOF)
+		self.FILE.close()
+		self.pool.shutdown()
+
+		super().close()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+
+## Shared JBrowse track handling for the A2A scripts
+
+name = 'jbrowse_utilities.py'
+version = '0.1.2'
+updated = '2026-10-18'
+
+## Tracks are written in the layout of JBrowse's flatfile-to-json.pl: for each reference
+## sequence, tracks/<label>/<refseq>/trackData.json holds a nested containment list (NCList)
+## of the features, as arrays whose first element is the number of a class listing their
+## attributes. Large lists are split into lf-<chunk>.json files loaded on demand, and feature
+## density histograms (hist-<bases per bin>-<chunk>.json) are used when zoomed out.
+
+import json
+from os import makedirs,replace,getpid
+from os.path import isdir,isfile
+from shutil import rmtree
+from urllib.parse import unquote
+from fcntl import flock,LOCK_EX,LOCK_UN
+import numpy as np
+from file_utilities import open_file
+
+## Approximate size of the feature chunks (lf-*.json), in bytes of JSON
+CHUNK_BYTES = 200000
+
+## Histogram bins are stored in chunks of this many bins
+HISTOGRAM_CHUNK = 10000
+
+## Bin sizes tried for the histograms, as multiples of the smallest one
+HISTOGRAM_MULTIPLES = (1,2,5,10,20,50,100,200,500,1000,2000,5000,10000)
+
+STRANDS = {'+': 1, '-': -1, '.': 0}
+
+def gff3_lines(file):
+
+	## Yields (seqid, line) for the feature lines of a GFF3 file, up to a ##FASTA section
+
+	GFF = open_file(file,'r')
+
+	for line in GFF:
+
+		if line.startswith("##FASTA"):
+			break
+
+		if line.startswith("#") or not line.strip():
+			continue
+
+		yield line.split("\t",1)[0],line
+
+	GFF.close()
+
+def gff3_sequences(file):
+
+	## Yields (refseq, lines) once for each reference sequence of a GFF3 file. A first pass
+	## finds the sequences whose lines are not grouped together; the lines of the others,
+	## usually all of them, are streamed one sequence at a time, and those of scattered
+	## sequences are collected and yielded at the end.
+
+	seen = set()
+	scattered = set()
+	refseq = None
+
+	for seqid,line in gff3_lines(file):
+		if seqid != refseq:
+			if seqid in seen:
+				scattered.add(seqid)
+			seen.add(seqid)
+			refseq = seqid
+
+	grouped = {seqid: [] for seqid in sorted(scattered)}
+	refseq = None
+	lines = []
+
+	for seqid,line in gff3_lines(file):
+
+		if seqid in grouped:
+			grouped[seqid].append(line)
+			continue
+
+		if seqid != refseq:
+			if refseq is not None:
+				yield refseq,lines
+			refseq = seqid
+			lines = []
+
+		lines.append(line)
+
+	if refseq is not None:
+		yield refseq,lines
+
+	for seqid in grouped:
+		yield seqid,grouped[seqid]
+
+def gff3_features(lines,types=None):
+
+	## Top-level features of GFF3 lines as JBrowse attribute dictionaries (Start, End, Strand,
+	## Source, Phase, Type, Score, Seq_id, then the GFF3 attributes with their first letter
+	## capitalized, ID becoming Id), with their descendants in Subfeatures. With types, only
+	## top-level features of these types are kept.
+
+	features = []
+	identifiers = {}
+	children = []
+
+	for line in lines:
+
+		data = line.rstrip("\n").split("\t")
+
+		if len(data) < 9:
+			continue
+
+		feature = {'Start': int(data[3]) - 1, 'End': int(data[4]), 'Strand': STRANDS.get(data[6])}
+
+		if data[1] != ".":
+			feature['Source'] = data[1]
+		if data[7] != ".":
+			feature['Phase'] = int(data[7])
+
+		feature['Type'] = data[2]
+
+		if data[5] != ".":
+			feature['Score'] = float(data[5])
+
+		feature['Seq_id'] = data[0]
+
+		parents = []
+
+		for field in data[8].strip().strip(";").split(";"):
+			if "=" not in field:
+				continue
+			key,value = field.strip().split("=",1)
+			values = [unquote(item) for item in value.split(",")]
+			if key == 'Parent':
+				parents = values
+				continue
+			key = 'Id' if key == 'ID' else key[0].upper() + key[1:]
+			feature[key] = values[0] if len(values) == 1 else values
+
+		if 'Id' in feature:
+			identifiers[feature['Id']] = feature
+
+		if parents:
+			children.append((parents,feature))
+		else:
+			features.append(feature)
+
+	## Children are attached once all features are known, so that they may precede their
+	## parents; orphans are kept as top-level features
+	for parents,feature in children:
+		attached = False
+		for parent in parents:
+			if parent in identifiers:
+				identifiers[parent].setdefault('Subfeatures',[]).append(feature)
+				attached = True
+		if not attached:
+			features.append(feature)
+
+	if types:
+		features = [feature for feature in features if feature['Type'] in types]
+
+	return features
+
+class Classes:
+
+	## Registry of the attribute lists (classes) of the feature arrays
+
+	def __init__(self):
+
+		self.classes = []
+		self.numbers = {}
+
+	def number(self,attributes,arrays):
+
+		key = (attributes,arrays)
+
+		if key not in self.numbers:
+			self.numbers[key] = len(self.classes)
+			self.classes.append({'isArrayAttr': {attribute: 1 for attribute in arrays},'attributes': list(attributes)})
+
+		return self.numbers[key]
+
+	def array(self,feature,sublist=None):
+
+		## Feature as [class, attribute values...], its subfeatures converted as well
+
+		attributes = tuple(key for key in feature if feature[key] is not None)
+		values = []
+
+		for key in attributes:
+			if key == 'Subfeatures':
+				values.append([self.array(subfeature) for subfeature in sorted(feature[key],key=lambda x: (x['Start'],-x['End']))])
+			else:
+				values.append(feature[key])
+
+		arrays = ('Subfeatures',) if 'Subfeatures' in attributes else ()
+
+		if sublist:
+			attributes += ('Sublist',)
+			arrays += ('Sublist',)
+			values.append(sublist)
+
+		return [self.number(attributes,arrays)] + values
+
+def nest(intervals):
+
+	## Nested containment list of (start, end, item) intervals: intervals contained in another
+	## are placed in its sublist. Returns [(start, end, item, sublist)], sorted by start.
+
+	## Identical intervals are kept side by side rather than nested in one another, which
+	## keeps the lists shallow for e.g. repeated BLAST hits
+
+	top = []
+	stack = []
+
+	for start,end,item in sorted(intervals,key=lambda x: (x[0],-x[1])):
+
+		while stack and stack[-1][0][1] < end:
+			stack.pop()
+
+		node = (start,end,item,[])
+
+		if stack and stack[-1][0][:2] == (start,end):
+			stack[-1][1].append(node)
+			continue
+
+		siblings = stack[-1][0][3] if stack else top
+		siblings.append(node)
+		stack.append((node,siblings))
+
+	return top
+
+def histograms(starts,ends,length,count):
+
+	## Feature counts per bin at increasing bin sizes, as (bases per bin, counts); features
+	## are counted in every bin they overlap
+
+	if not count or not length:
+		return []
+
+	base = int(10 ** max(1,np.ceil(np.log10(length * 2.5 / count))))
+	levels = []
+
+	for multiple in HISTOGRAM_MULTIPLES:
+
+		size = base * multiple
+		bins = (length + size - 1) // size
+
+		first = starts // size
+		last = np.maximum(ends - 1,starts) // size
+
+		change = np.zeros(bins + 1,dtype=np.int64)
+		np.add.at(change,np.minimum(first,bins),1)
+		np.add.at(change,np.minimum(last + 1,bins),-1)
+
+		levels.append((size,np.cumsum(change)[:bins]))
+
+		if bins == 1:
+			break
+
+	return levels
+
+def write_refseq(directory,features,length=None):
+
+	## Writes trackData.json, and its feature chunks and histograms, for the features of one
+	## reference sequence, replacing any previous version. Returns the number of features.
+
+	if isdir(directory):
+		rmtree(directory)
+
+	makedirs(directory,mode=0o755)
+
+	classes = Classes()
+
+	def ARRAYS(nodes):
+		return [classes.array(feature,ARRAYS(sublist) if sublist else None) for start,end,feature,sublist in nodes]
+
+	top = nest([(feature['Start'],feature['End'],feature) for feature in features])
+
+	## Top-level features are split into consecutive chunks of about CHUNK_BYTES
+	chunks = []
+	size = 0
+
+	for node in top:
+		array = ARRAYS([node])[0]
+		length_json = len(json.dumps(array,separators=(',',':')))
+		if not chunks or size + length_json > CHUNK_BYTES:
+			chunks.append([node[0],node[1],[]])
+			size = 0
+		chunks[-1][1] = max(chunks[-1][1],node[1])
+		chunks[-1][2].append(array)
+		size += length_json
+
+	## Placeholders of the chunks, loaded when the region they span is displayed
+	lazy_class = classes.number(('Start','End','Chunk'),('Sublist',))
+
+	if len(chunks) <= 1:
+		nclist = chunks[0][2] if chunks else []
+	else:
+		for number,(start,end,arrays) in enumerate(chunks,1):
+			CHUNK = open(f"{directory}/lf-{number}.json",'w')
+			json.dump(arrays,CHUNK,separators=(',',':'))
+			CHUNK.close()
+		stubs = nest([(start,end,number) for number,(start,end,arrays) in enumerate(chunks,1)])
+		def STUBS(nodes):
+			return [[lazy_class,start,end,number] + ([STUBS(sublist)] if sublist else []) for start,end,number,sublist in nodes]
+		nclist = STUBS(stubs)
+
+	starts = np.array([feature['Start'] for feature in features],dtype=np.int64)
+	ends = np.array([feature['End'] for feature in features],dtype=np.int64)
+
+	min_start = int(starts.min()) if len(starts) else 0
+	max_end = int(ends.max()) if len(ends) else 0
+	length = length if length else max_end
+
+	meta = []
+	stats = []
+
+	for bases,counts in histograms(starts,ends,length,len(features)):
+		for chunk in range(0,len(counts),HISTOGRAM_CHUNK):
+			HIST = open(f"{directory}/hist-{bases}-{chunk // HISTOGRAM_CHUNK}.json",'w')
+			json.dump(counts[chunk:chunk+HISTOGRAM_CHUNK].tolist(),HIST,separators=(',',':'))
+			HIST.close()
+		meta.append({'basesPerBin': str(bases),'arrayParams': {'length': len(counts),'chunkSize': HISTOGRAM_CHUNK,'urlTemplate': f"hist-{bases}-{{Chunk}}.json"}})
+		stats.append({'basesPerBin': str(bases),'max': int(counts.max()),'mean': float(counts.mean())})
+
+	track = {
+		'featureCount': len(features),
+		'histograms': {'meta': meta,'stats': stats},
+		'intervals': {
+			'classes': classes.classes,
+			'lazyClass': lazy_class,
+			'count': len(features),
+			'minStart': min_start,
+			'maxEnd': max_end,
+			'nclist': nclist,
+			'urlTemplate': "lf-{Chunk}.json",
+		},
+		'formatVersion': 1,
+	}
+
+	DATA = open(f"{directory}/trackData.json",'w')
+	json.dump(track,DATA,separators=(',',':'))
+	DATA.close()
+
+	return len(features)
+
+def reference_lengths(path):
+
+	## Lengths of the reference sequences of a JBrowse data directory (seq/refSeqs.json)
+
+	if not isfile(f"{path}/seq/refSeqs.json"):
+		return {}
+
+	REFSEQS = open(f"{path}/seq/refSeqs.json",'r')
+	refseqs = json.load(REFSEQS)
+	REFSEQS.close()
+
+	return {refseq['name']: refseq.get('length',refseq['end'] - refseq.get('start',0)) for refseq in refseqs}
+
+def write_track(path,gff,label,types=None,key=None):
+
+	## Writes the NCList track of a GFF3 file under path/tracks/label, as flatfile-to-json.pl
+	## does, and returns its trackList.json entry and number of features
+
+	lengths = reference_lengths(path)
+	count = 0
+
+	for refseq,lines in gff3_sequences(gff):
+		count += write_refseq(f"{path}/tracks/{label}/{refseq}",gff3_features(lines,types),lengths.get(refseq))
+
+	config = {
+		'style': {'className': 'feature'},
+		'key': key if key else label,
+		'storeClass': 'JBrowse/Store/SeqFeature/NCList',
+		'trackType': None,
+		'urlTemplate': f"tracks/{label}/{{refseq}}/trackData.json",
+		'compress': 0,
+		'label': label,
+		'type': 'FeatureTrack',
+	}
+
+	return config,count
+
+def bigwig_track(label,url,minimum,maximum,key=None):
+
+	## trackList.json entry of a BigWig file (e.g. read depth), drawn as an XY plot scaled
+	## from minimum to maximum
+
+	return {
+		'key': key if key else label,
+		'storeClass': 'JBrowse/Store/SeqFeature/BigWig',
+		'urlTemplate': url,
+		'type': 'JBrowse/View/Track/Wiggle/XYPlot',
+		'min_score': minimum,
+		'max_score': maximum,
+		'label': label,
+	}
+
+def add_track(path,config):
+
+	## Adds a track to path/trackList.json, replacing any track with the same label. The file
+	## is locked while it is updated, and replaced in a single step, so that concurrent builds
+	## neither lose each other's tracks nor leave it half-written.
+
+	LOCK = open(f"{path}/trackList.json.lock",'w')
+	flock(LOCK,LOCK_EX)
+
+	try:
+
+		tracklist = {'formatVersion': 1,'tracks': []}
+
+		if isfile(f"{path}/trackList.json"):
+			TRACKLIST = open(f"{path}/trackList.json",'r')
+			tracklist = json.load(TRACKLIST)
+			TRACKLIST.close()
+
+		tracks = tracklist.setdefault('tracks',[])
+		labels = [track.get('label') for track in tracks]
+
+		if config['label'] in labels:
+			tracks[labels.index(config['label'])] = config
+		else:
+			tracks.append(config)
+
+		TRACKLIST = open(f"{path}/.trackList.json.{getpid()}",'w')
+		json.dump(tracklist,TRACKLIST,indent=3)
+		TRACKLIST.write("\n")
+		TRACKLIST.close()
+
+		replace(f"{path}/.trackList.json.{getpid()}",f"{path}/trackList.json")
+
+	finally:
+		flock(LOCK,LOCK_UN)
+		LOCK.close()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+## Shared k-mer and minimizer handling for the A2A scripts
+
+name = 'kmer_utilities.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+import numpy as np
+from fasta_utilities import read_fasta
+
+## Nucleotides are packed 2 bits each; anything else (N, IUPAC codes) breaks k-mers
+ENCODING = np.full(256,4,dtype=np.uint8)
+for code,bases in enumerate(('Aa','Cc','Gg','Tt')):
+	for base in bases:
+		ENCODING[ord(base)] = code
+
+## Sequences are processed in chunks to bound the size of the intermediate arrays
+CHUNK_SIZE = 1 << 22
+
+## Hash of a k-mer marking positions that cannot be used
+INVALID = np.iinfo(np.uint64).max
+
+def encode(sequence):
+
+	## 2-bit codes of a nucleotide sequence, 4 for any other character
+
+	return ENCODING[np.frombuffer(sequence.encode(),dtype=np.uint8)]
+
+def mix(values):
+
+	## Invertible 64-bit hash, so that minimizers are not biased towards poly-A k-mers
+
+	values = values ^ (values >> np.uint64(31))
+	values = values * np.uint64(0x9e3779b97f4a7c15)
+	values = values ^ (values >> np.uint64(29))
+
+	return values
+
+def kmers(codes,k):
+
+	## Canonical k-mer hashes (k <= 31) of 2-bit codes and their orientation: True when the
+	## forward k-mer is the canonical one. K-mers overlapping a non-ACGT base get INVALID.
+
+	count = len(codes) - k + 1
+
+	## K-mer values are assembled by doubling: values of 2n-mers are built from pairs of
+	## n-mers, and the k-mers from the powers of two making up k
+	base = np.minimum(codes,3).astype(np.uint64)
+	complement = np.uint64(3) - base
+
+	forward = np.zeros(count,dtype=np.uint64)
+	reverse = np.zeros(count,dtype=np.uint64)
+
+	length = 1
+	offset = 0
+
+	while length <= k:
+		if k & length:
+			forward = (forward << np.uint64(2*length)) | base[offset:offset+count]
+			reverse = reverse | (complement[offset:offset+count] << np.uint64(2*offset))
+			offset += length
+		if 2*length <= k:
+			base = (base[:-length] << np.uint64(2*length)) | base[length:]
+			complement = complement[:-length] | (complement[length:] << np.uint64(2*length))
+		length *= 2
+
+	## Number of non-ACGT bases in each k-mer
+	invalid = np.concatenate(([0],np.cumsum(codes > 3)))
+	invalid = invalid[k:] - invalid[:count]
+
+	strand = forward <= reverse
+	hashes = mix(np.where(strand,forward,reverse))
+	hashes[invalid > 0] = INVALID
+
+	return hashes,strand
+
+def minimizers(sequence,k=21,w=11):
+
+	## (W,K) minimizers of a sequence: the smallest canonical k-mer hash(es) in each window
+	## of w consecutive k-mers. Returns the positions (0-based start of the k-mer), hashes and
+	## orientations of the distinct minimizers, in sequence order.
+
+	positions = []
+	hashes = []
+	strands = []
+
+	span = k + w - 1
+	last = -1
+
+	for start in range(0,max(1,len(sequence) - span + 1),CHUNK_SIZE):
+
+		## Consecutive chunks overlap so that every window is seen once
+		chunk = sequence[start:start+CHUNK_SIZE+span-1]
+
+		if len(chunk) < span:
+			break
+
+		chunk_hashes,chunk_strands = kmers(encode(chunk),k)
+
+		## Minimum of each window, then for each k-mer the largest minimum of the windows
+		## containing it: a k-mer is a minimizer when it equals that value. As in minimap2,
+		## all k-mers tied for the minimum of a window are kept.
+		count = len(chunk_hashes) - w + 1
+
+		window_min = chunk_hashes[:count].copy()
+		for offset in range(1,w):
+			np.minimum(window_min,chunk_hashes[offset:offset+count],out=window_min)
+
+		padded = np.concatenate((np.zeros(w-1,dtype=np.uint64),window_min,np.zeros(w-1,dtype=np.uint64)))
+		covering = padded[:len(chunk_hashes)].copy()
+		for offset in range(1,w):
+			np.maximum(covering,padded[offset:offset+len(chunk_hashes)],out=covering)
+
+		selected = np.flatnonzero(chunk_hashes == covering)
+		selected = selected[(chunk_hashes[selected] != INVALID) & (selected + start > last)]
+
+		positions.append(selected + start)
+		hashes.append(chunk_hashes[selected])
+		strands.append(chunk_strands[selected])
+
+		if len(selected):
+			last = positions[-1][-1]
+
+	if not positions:
+		return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.uint64),np.zeros(0,dtype=bool)
+
+	return np.concatenate(positions),np.concatenate(hashes),np.concatenate(strands)
+
+def minimizer_set(files,k=21,w=11):
+
+	## Sorted distinct minimizer hashes of all sequences in FASTA file(s)
+
+	hashes = []
+
+	for file in files:
+		for header,sequence in read_fasta(file):
+			hashes.append(np.unique(minimizers(sequence,k,w)[1]))
+
+	if not hashes:
+		return np.zeros(0,dtype=np.uint64)
+
+	return np.unique(np.concatenate(hashes))
+
+def containment(hashes,index):
+
+	## Fraction of distinct hashes found in a sorted hash array, and the number found
+
+	hashes = np.unique(hashes)
+
+	if not len(hashes) or not len(index):
+		return 0.0,0
+
+	found = np.searchsorted(index,hashes)
+	found[found == len(index)] = 0
+	shared = int(np.count_nonzero(index[found] == hashes))
+
+	return shared/len(hashes),shared
+
+class MinimizerIndex:
+
+	## Minimizers of a set of sequences, held in NumPy arrays sorted by hash: hash, sequence
+	## number, position and orientation (about 17 bytes per minimizer). Minimizers found more
+	## than max_occurrences times, usually from repeats, are not used as seeds.
+
+	def __init__(self,sequences,k=15,w=10,max_occurrences=50):
+
+		self.k = k
+		self.w = w
+		self.max_occurrences = max_occurrences
+
+		hashes = []
+		targets = []
+		positions = []
+		strands = []
+
+		for number,sequence in enumerate(sequences):
+			sequence_positions,sequence_hashes,sequence_strands = minimizers(sequence,k,w)
+			hashes.append(sequence_hashes)
+			targets.append(np.full(len(sequence_hashes),number,dtype=np.int32))
+			positions.append(sequence_positions.astype(np.int64))
+			strands.append(sequence_strands)
+
+		hashes = np.concatenate(hashes) if hashes else np.zeros(0,dtype=np.uint64)
+		order = np.argsort(hashes,kind='stable')
+
+		self.hashes = hashes[order]
+		self.targets = np.concatenate(targets)[order] if targets else np.zeros(0,dtype=np.int32)
+		self.positions = np.concatenate(positions)[order] if positions else np.zeros(0,dtype=np.int64)
+		self.strands = np.concatenate(strands)[order] if strands else np.zeros(0,dtype=bool)
+
+	def __len__(self):
+
+		return len(self.hashes)
+
+	def lookup(self,hashes):
+
+		## First entry and number of entries of each hash
+
+		left = np.searchsorted(self.hashes,hashes,'left')
+		counts = np.searchsorted(self.hashes,hashes,'right') - left
+
+		return left,counts
+
+	def anchors(self,positions,hashes,strands):
+
+		## Seed matches of query minimizers: query position, target number, target position
+		## and whether query and target k-mers are on the same strand. Also returns which
+		## query minimizers could be used as seeds, i.e. are not repeated in the index.
+
+		left,counts = self.lookup(hashes)
+
+		usable = counts <= self.max_occurrences
+		counts[~usable] = 0
+
+		query = np.repeat(np.arange(len(hashes)),counts)
+		entries = np.repeat(left - np.cumsum(counts) + counts,counts) + np.arange(len(query))
+
+		return positions[query],self.targets[entries],self.positions[entries],strands[query] == self.strands[entries],usable
+
+def chain_anchors(qpos,targets,tpos,same,band=500,max_gap=10000):
+
+	## Groups anchors into chains of co-linear seeds: anchors on the same target and strand
+	## whose diagonals (tpos - qpos, or tpos + qpos on the reverse strand) differ by at most
+	## band, split wherever consecutive anchors are more than max_gap apart on the query.
+	## Returns the chain number of each anchor, numbered in the order of the sorted anchors.
+
+	if not len(qpos):
+		return np.zeros(0,dtype=np.int64)
+
+	diagonals = np.where(same,tpos - qpos,tpos + qpos)
+
+	order = np.lexsort((diagonals,~same,targets))
+	new = np.ones(len(order),dtype=bool)
+	new[1:] = (targets[order][1:] != targets[order][:-1]) | (same[order][1:] != same[order][:-1]) | (np.diff(diagonals[order]) > band)
+	bands = np.cumsum(new)
+
+	## Within a diagonal band, anchors are ordered along the query
+	order = order[np.lexsort((qpos[order],bands))]
+	bands = np.sort(bands)
+	new = np.ones(len(order),dtype=bool)
+	new[1:] = (bands[1:] != bands[:-1]) | (np.diff(qpos[order]) > max_gap)
+
+	chains = np.empty(len(order),dtype=np.int64)
+	chains[order] = np.cumsum(new) - 1
+
+	return chains
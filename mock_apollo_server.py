@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+name = 'mock_apollo_server.py'
+version = '0.3.1'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Local stand-in for the Apollo web services used by apollo_annotator_utilities.py, to
+		test it offline. Organisms and annotations are kept in memory; requests are checked
+		against the given credentials and answered as Apollo does. The number of requests and
+		of HTTP connections opened by clients are reported by GET /mock/stats.
+
+USAGE		{name} \\
+		  -p 8085 \\
+		  -c mock-arrow.yml
+
+		ARROW_GLOBAL_CONFIG_PATH=mock-arrow.yml apollo_annotator_utilities.py ...
+
+OPTIONS
+-a (--address)	Address to listen on [Default: 127.0.0.1]
+-p (--port)	Port to listen on [Default: 8085]
+-u (--username)	Apollo username [Default: admin@local.host]
+-w (--password)	Apollo password [Default: password]
+-c (--config)	Write an arrow configuration file pointing to this server
+-l (--latency)	Delay added to each request, in seconds [Default: 0]
+-f (--fail)	Fraction of annotation requests answered with an HTTP 500 error, to test retries [Default: 0]
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from http.server import ThreadingHTTPServer,BaseHTTPRequestHandler
+from threading import Lock
+from uuid import uuid4
+from time import sleep,time
+from random import random
+import json
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-a","--address",default='127.0.0.1')
+GetOptions.add_argument("-p","--port",type=int,default=8085)
+GetOptions.add_argument("-u","--username",default='admin@local.host')
+GetOptions.add_argument("-w","--password",default='password')
+GetOptions.add_argument("-c","--config")
+GetOptions.add_argument("-l","--latency",type=float,default=0)
+GetOptions.add_argument("-f","--fail",type=float,default=0)
+
+args = GetOptions.parse_args()
+
+address = args.address
+port = args.port
+username = args.username
+password = args.password
+config = args.config
+latency = args.latency
+fail = args.fail
+
+url = f"http://{address}:{port}/apollo"
+
+## Server state; organisms => id => organism, with its features as sequence => uniquename => feature
+organisms = {}
+stats = {'requests': 0, 'connections': 0, 'failed': 0}
+lock = Lock()
+
+def ORGANISM(key):
+
+	## Apollo accepts an organism id or common name
+	for organism in organisms.values():
+		if str(organism['id']) == str(key) or organism['commonName'] == key:
+			return organism
+
+	return None
+
+def ORGANISM_LIST(organism=None):
+
+	selected = [ORGANISM(organism)] if organism else organisms.values()
+
+	return [{key: value for key,value in organism.items() if key != 'features'} for organism in selected if organism]
+
+def ASSIGN(feature,sequence):
+
+	## Gives stored features, and their children, their own unique names as Apollo does.
+	## Apollo creates a feature before adding its children, updating it for each one, so
+	## features with children are last modified after their creation.
+	feature = dict(feature)
+	feature['uniquename'] = str(uuid4())
+	feature['sequence'] = sequence
+	feature['date_creation'] = feature['date_last_modified'] = int(1000*time())
+
+	if 'children' in feature:
+		feature['children'] = [ASSIGN(child,sequence) for child in feature['children']]
+		feature['date_last_modified'] = max([feature['date_creation']] + [child['date_last_modified'] for child in feature['children']]) + len(feature['children'])
+
+	return feature
+
+def ORGANISM_OPERATION(method,data):
+
+	if method == 'addOrganism':
+		if ORGANISM(data['commonName']):
+			return {'error': f"Organism {data['commonName']} already exists"}
+		number = max(organisms.keys(),default=0) + 1
+		organisms[number] = {
+			'id': number,
+			'commonName': data['commonName'],
+			'directory': data['directory'],
+			'genus': data.get('genus'),
+			'species': data.get('species'),
+			'publicMode': data.get('publicMode',False),
+			'features': {},
+		}
+		return ORGANISM_LIST()
+
+	if method == 'findAllOrganisms':
+		return ORGANISM_LIST(data.get('organism'))
+
+	organism = ORGANISM(data.get('organism',data.get('id')))
+
+	if organism is None:
+		return {'error': f"Organism {data.get('organism',data.get('id'))} not found"}
+
+	if method == 'deleteOrganism':
+		del organisms[organism['id']]
+		return ORGANISM_LIST()
+
+	if method == 'deleteOrganismFeatures':
+		organism['features'] = {}
+		return {}
+
+	if method == 'getSequencesForOrganism':
+		return {'sequences': [{'name': sequence} for sequence in sorted(organism['features'].keys())]}
+
+	return None
+
+def ANNOTATION_OPERATION(method,data):
+
+	organism = ORGANISM(data.get('organism'))
+	sequence = data.get('sequence')
+
+	if organism is None:
+		return {'error': f"Organism {data.get('organism')} not found"}
+
+	features = organism['features'].setdefault(sequence,{})
+
+	if method in ('addFeature','addTranscript'):
+		added = [ASSIGN(feature,sequence) for feature in data.get('features',[])]
+		for feature in added:
+			features[feature['uniquename']] = feature
+		return {'features': added}
+
+	if method == 'getFeatures':
+		return {'features': list(features.values())}
+
+	if method == 'deleteFeature':
+		for feature in data.get('features',[]):
+			features.pop(feature['uniquename'],None)
+		return {'features': []}
+
+	## Curator edits, e.g. to test that --sync_annotations leaves them alone
+	if method == 'setBoundaries':
+		edited = []
+		for feature in data.get('features',[]):
+			if feature['uniquename'] in features:
+				stored = features[feature['uniquename']]
+				stored['location'] = dict(stored['location'],**feature['location'])
+				stored['date_last_modified'] = int(1000*time()) + 1
+				edited.append(stored)
+		return {'features': edited}
+
+	return None
+
+class MockApollo(BaseHTTPRequestHandler):
+
+	protocol_version = 'HTTP/1.1'
+
+	def setup(self):
+		super().setup()
+		with lock:
+			stats['connections'] += 1
+
+	def log_message(self,format,*details):
+		pass
+
+	def reply(self,status,body):
+		content = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header("Content-Type","application/json")
+		self.send_header("Content-Length",str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+	def do_GET(self):
+		if self.path.rstrip("/").endswith("/mock/stats"):
+			with lock:
+				self.reply(200,dict(stats))
+		else:
+			self.reply(404,{'error': f"Unknown path {self.path}"})
+
+	def do_POST(self):
+
+		body = self.rfile.read(int(self.headers.get('Content-Length',0)))
+
+		if latency:
+			sleep(latency)
+
+		try:
+			data = json.loads(body) if body else {}
+		except ValueError:
+			self.reply(400,{'error': "Request body is not JSON"})
+			return
+
+		## Paths end in <controller>/<method>, e.g. /apollo/organism/addOrganism
+		controller,method = self.path.split("?")[0].rstrip("/").split("/")[-2:]
+
+		with lock:
+
+			stats['requests'] += 1
+
+			if controller == 'annotationEditor' and random() < fail:
+				stats['failed'] += 1
+				self.reply(500,{'error': "Simulated server error"})
+				return
+
+			if data.get('username') != username or data.get('password') != password:
+				response = {'error': "You must provide valid credentials"}
+			elif controller == 'organism':
+				response = ORGANISM_OPERATION(method,data)
+			elif controller == 'annotationEditor':
+				response = ANNOTATION_OPERATION(method,data)
+			else:
+				response = None
+
+		if response is None:
+			self.reply(404,{'error': f"Unknown operation {controller}/{method}"})
+		else:
+			self.reply(200,response)
+
+if config:
+	CONFIG = open(config,'w')
+	CONFIG.write("__default: mock\n")
+	CONFIG.write("mock:\n")
+	CONFIG.write(f"    url: \"{url}\"\n")
+	CONFIG.write(f"    username: \"{username}\"\n")
+	CONFIG.write(f"    password: \"{password}\"\n")
+	CONFIG.close()
+
+server = ThreadingHTTPServer((address,port),MockApollo)
+server.daemon_threads = True
+
+print(f"Mock Apollo listening on {url}")
+
+try:
+	server.serve_forever()
+except KeyboardInterrupt:
+	pass
+
+server.server_close()
+
+print(f"Served {stats['requests']} request(s) over {stats['connections']} connection(s)")
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = 'oreint_fastas_to_reference.py'
-version = '0.3.4'
-updated = '2023-04-12'
+version = '0.8.5'
+updated = '2026-10-18'
 
 usage = f"""
 NAME		{name}
@@ -18,12 +18,45 @@ USAGE		{name} \\
 
 OPTIONS
 -f (--fasta)		FASTA files to orient
--r (--ref)		Reference genome assembly
+-r (--ref)		Reference genome assembly, or several references searched together
 -o (--outdir)		Output directory [Default:'oriented_fastas']
+-w (--width)		Line width of output FASTA files [Default: 60]
 
 -i (--min_pident)	Minimum percent identity to assign segment to reference [Default: 95%]
 -a (--min_palign)	Minumum percent of the contig participating in alignment to assign segment to reference [Default: 5%]
 -v (--max_overlp)	Maximum percent of alignment allowed to overlap a previous alignment to assign segment to reference [Default: 5%]
+
+-c (--cache)		Directory in which to keep a BLAST database of the reference, reused by later runs
+-t (--threads)		Number of BLAST threads (Applicable if --cache or --batch) [Default: 1]
+-j (--jobs)		Number of FASTA files to orient in parallel [Default: 1]
+-b (--batch)		Search all FASTA files against the reference with a single blastn
+-z (--bgzip)		Write bgzip-compressed FASTA and BLAST outputs
+
+-m (--mapper)		Mapping method: blastn or minimizer [Default: blastn]
+-k (--kmer)		K-mer size of the minimizer mapper, up to 31 [Default: 15]
+-s (--window)		Minimizer window of the minimizer mapper, in k-mers [Default: 10]
+
+NOTE		FASTA inputs and the reference can be gzip/bgzip-compressed, or 2-bit sequence stores
+		(.a2bit, see fasta_to_twobit.py). A compressed or packed reference is searched through a
+		temporary BLAST database unless --cache is given.
+
+		With several references, their sequences are searched together as <reference>:<sequence>,
+		where <reference> is the name of the reference file up to its first dot, and each contig is
+		assigned to its best supported segment among all references. The all.map, links.txt and
+		karyotype.txt reports cover all references, and are also written for each reference in a
+		subdirectory named after it.
+
+		With --batch, the sequences of all FASTA files are searched as a single query against a
+		BLAST database of the reference (kept in --cache if given), and the hits are split back
+		into the results.blastn.6 file of each FASTA. Outputs are the same as when each FASTA
+		is searched on its own against the same database. Not available with --mapper minimizer.
+
+		With --mapper minimizer, contigs are mapped by chaining their minimizers on an index of
+		the reference minimizers, and each chain is used as an HSP with an identity estimated
+		from its share of matching minimizers. Only contigs whose best chain is ambiguous or
+		below the identity/length thresholds, or without any chain, are searched with blastn.
+		The BLAST database of the reference, if one is needed, is only built when a contig falls
+		back to blastn.
 """
 
 from sys import argv
@@ -33,93 +66,671 @@ if len(argv) < 2:
 	exit()
 
 from argparse import ArgumentParser
-from os.path import isdir,basename
-from os import makedirs,system
-from textwrap import wrap
+from os.path import isdir,isfile,basename
+from os import makedirs,rename,remove,devnull
+from subprocess import run,Popen,PIPE,DEVNULL
+from multiprocessing import get_context
+from contextlib import redirect_stdout
+from io import StringIO
+from shutil import rmtree,which
+from fcntl import flock,LOCK_EX,LOCK_UN
+from tempfile import mkdtemp,TemporaryDirectory
+from hashlib import md5
+from collections import namedtuple
+from itertools import groupby,chain
+from operator import attrgetter
+import numpy as np
+from bisect import bisect_left,bisect_right
+from fasta_utilities import read_fasta,write_fasta,reverse_complement_chunks
+from blast_utilities import stream_blast,feed,BLASTError,MISSING
+from file_utilities import open_file,is_compressed,strip_compression,is_twobit
+from kmer_utilities import MinimizerIndex,minimizers,chain_anchors
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-f","--fasta",nargs='+',required=True)
-GetOptions.add_argument("-r","--ref",required=True)
+GetOptions.add_argument("-r","--ref",nargs='+',required=True)
 GetOptions.add_argument("-o","--outdir",default='oriented_fastas')
+GetOptions.add_argument("-w","--width",default=60,type=int)
 
 GetOptions.add_argument("-i","--min_pident",default=95,type=float,choices=[x for x in range(0,101)])
 GetOptions.add_argument("-a","--min_palign",default=5,type=float,choices=[x for x in range(0,101)])
 GetOptions.add_argument("-v","--max_overlp",default=5,type=float,choices=[x for x in range(0,101)])
 
+GetOptions.add_argument("-c","--cache",default=False)
+GetOptions.add_argument("-t","--threads",default=1,type=int)
+GetOptions.add_argument("-j","--jobs",default=1,type=int)
+GetOptions.add_argument("-b","--batch",default=False,action='store_true')
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
+
+GetOptions.add_argument("-m","--mapper",default='blastn',choices=['blastn','minimizer'])
+GetOptions.add_argument("-k","--kmer",default=15,type=int)
+GetOptions.add_argument("-s","--window",default=10,type=int)
+
 
 args = GetOptions.parse_args()
 
 fastas = args.fasta
-ref = args.ref
+refs = args.ref
 outdir = args.outdir
+width = args.width
 
 min_pident = args.min_pident
 min_palign = args.min_palign
 max_overlp = args.max_overlp
 
+cache = args.cache
+threads = args.threads
+jobs = args.jobs
+batch = args.batch
+
+compressed = ".gz" if args.bgzip else ""
+
+mapper = args.mapper
+kmer = args.kmer
+window = args.window
+
+if not 0 < kmer <= 31:
+	print(f"  [E] K-mer size must be between 1 and 31")
+	exit(1)
+
+if batch and mapper != 'blastn':
+	print(f"  [E] --batch is only available with --mapper blastn")
+	exit(1)
+
+
+## Write buffer of the all.map, links.txt and karyotype.txt reports
+REPORT_BUFFER = 1 << 20
+
+## Minimizer mapper: minimum number of seeds in a chain, and minimum share of the best
+## chain's seeds that another chain over the same part of a contig must have to make its
+## placement ambiguous
+MIN_ANCHORS = 3
+AMBIGUITY = 0.9
+
+## Bases by which consecutive HSPs of a co-linear chain may overlap, on the contig or the
+## reference
+CHAIN_OVERLAP = 100
+
 
 ############################################################
 ## Useful functions
 ############################################################
 
-def reverse_complement(sequence):
+class AssignedBases:
+
+	## Keeps the assigned bases of a contig as sorted, merged, half-open intervals
+	## [start,end), so memory grows with the number of HSPs instead of contig length
+
+	def __init__(self):
+		self.starts = []
+		self.ends = []
+
+	def occupied(self,start,end):
+
+		## Number of bases in [start,end) that were already assigned
+
+		count = 0
+
+		index = bisect_right(self.ends,start)
+
+		while index < len(self.starts) and self.starts[index] < end:
+			count += min(end,self.ends[index]) - max(start,self.starts[index])
+			index += 1
+
+		return count
+
+	def assign(self,start,end):
+
+		if start >= end:
+			return
+
+		## Intervals touching or overlapping [start,end) are merged into a single one
+		first = bisect_left(self.ends,start)
+		last = bisect_right(self.starts,end)
+
+		if first < last:
+			start = min(start,self.starts[first])
+			end = max(end,self.ends[last-1])
+
+		self.starts[first:last] = [start]
+		self.ends[first:last] = [end]
+
+def CHECKSUM(file):
+
+	checksum = md5()
+
+	FILE = open(file,'rb')
+	for block in iter(lambda: FILE.read(1 << 20),b''):
+		checksum.update(block)
+	FILE.close()
+
+	return checksum.hexdigest()
+
+def REFERENCE_DB(reference,cache_dir):
+
+	## Databases are kept under the checksum of the reference FASTA, so an edited reference
+	## gets a new database. A database without its checksum file, or that blastdbcmd cannot
+	## read, was left behind by an interrupted build and is rebuilt. Builds are serialised
+	## by a lock, so that concurrent runs or workers build a database only once. Raises
+	## BLASTError if BLAST+ is missing or makeblastdb fails.
+
+	for program in ("makeblastdb","blastdbcmd"):
+		if not which(program):
+			raise BLASTError([program],None,MISSING)
+
+	checksum = CHECKSUM(reference)
+
+	db_dir = f"{cache_dir}/{checksum}"
+	db = f"{db_dir}/reference"
+	marker = f"{db_dir}/reference.md5"
+
+	if not isdir(cache_dir):
+		makedirs(cache_dir,mode=0o755,exist_ok=True)
+
+	LOCK = open(f"{cache_dir}/.{checksum}.lock",'w')
+	flock(LOCK,LOCK_EX)
+
+	try:
+		return BUILD_DB(reference,cache_dir,checksum,db_dir,db,marker)
+	finally:
+		flock(LOCK,LOCK_UN)
+		LOCK.close()
 
-	bases = {
-		'A':'T','a':'t',
-		'T':'A','t':'a',
-		'C':'G','c':'g',
-		'G':'C','g':'c',
-		'N':'N','n':'n'
+def BUILD_DB(reference,cache_dir,checksum,db_dir,db,marker):
+
+	if isfile(marker):
+
+		MARKER = open(marker,'r')
+		recorded = MARKER.read().strip()
+		MARKER.close()
+
+		if recorded == checksum and run(["blastdbcmd","-db",db,"-info"],stdout=DEVNULL,stderr=DEVNULL).returncode == 0:
+			print(f"Using cached BLAST database {db}")
+			return db
+
+	print(f"Building BLAST database for {reference} in {db_dir}")
+
+	## Build in a scratch directory and move it into place, so that an interrupted build
+	## never leaves a half-written database under the checksum
+	build_dir = mkdtemp(prefix=f".{checksum}.",dir=cache_dir)
+
+	command = ["makeblastdb","-dbtype","nucl","-parse_seqids","-out",f"{build_dir}/reference"]
+
+	if is_compressed(reference) or is_twobit(reference):
+		build = Popen(command + ["-in","-","-title",basename(reference)],stdin=PIPE,stdout=DEVNULL,text=True)
+		feed(build,reference)
+	else:
+		build = Popen(command + ["-in",reference],stdout=DEVNULL)
+
+	if build.wait() != 0:
+		rmtree(build_dir)
+		raise BLASTError(command,build.returncode,f"could not build a database of {reference}")
+
+	MARKER = open(f"{build_dir}/reference.md5",'w')
+	MARKER.write(f"{checksum}\n")
+	MARKER.close()
+
+	if isdir(db_dir):
+		rmtree(db_dir)
+
+	rename(build_dir,db_dir)
+
+	return db
+
+HSP = namedtuple('HSP',['qseqid','sseqid','length','pident','qstart','qend','qlen','sstart','send','slen','strand','bitscore'])
+
+class HitTable:
+
+	## BLAST HSPs held as typed NumPy columns. Query, subject and strand names are
+	## stored once and referenced by integer codes.
+
+	names = ['qseqid','sseqid','strand']
+	dtypes = {
+		'length':np.int32,'pident':np.float64,
+		'qstart':np.int32,'qend':np.int32,'qlen':np.int32,
+		'sstart':np.int32,'send':np.int32,'slen':np.int32,
+		'bitscore':np.float64,
 	}
 
-	seq = ""
+	def __init__(self,lines,batch_size=1 << 16):
+
+		self.labels = {column:{} for column in self.names}
+
+		batches = {column:[] for column in HSP._fields}
+		batch = []
+
+		for line in lines:
+			batch.append(line)
+			if len(batch) == batch_size:
+				self.parse(batch,batches)
+				batch = []
+
+		self.parse(batch,batches)
+
+		self.columns = {}
+
+		for column in HSP._fields:
+			dtype = np.int32 if column in self.names else self.dtypes[column]
+			self.columns[column] = np.concatenate(batches[column]) if batches[column] else np.empty(0,dtype=dtype)
+
+		## Codes to names, per categorical column
+		self.decode = {column:list(self.labels[column].keys()) for column in self.names}
+
+	def parse(self,batch,batches):
+
+		if not batch:
+			return
+
+		fields = zip(*[line.rstrip("\n").split("\t") for line in batch])
+
+		for column,values in zip(HSP._fields,fields):
+
+			if column in self.names:
+				labels = self.labels[column]
+				codes = [labels.setdefault(value,len(labels)) for value in values]
+				batches[column].append(np.array(codes,dtype=np.int32))
+			else:
+				batches[column].append(np.array(values,dtype=self.dtypes[column]))
+
+	def __len__(self):
+
+		return len(self.columns['bitscore'])
+
+	def candidates(self,min_pident,max_overlp):
+
+		## Yields the HSPs passing the identity and alignment length thresholds, grouped by
+		## query name in sorted order and by decreasing bitscore within a query. HSPs with
+		## equal bitscores keep the order in which BLAST reported them.
+
+		columns = self.columns
+
+		aligned = np.abs(columns['qstart'] - columns['qend']) + 1
+		keep = np.flatnonzero((columns['pident'] > min_pident) & (aligned > (max_overlp/100)*columns['qlen']))
+
+		query_names = self.decode['qseqid']
+		query_rank = np.argsort(np.argsort(np.array(query_names,dtype=object),kind='stable'),kind='stable')
 
-	for base in sequence[::-1]:
-		seq += bases[base]
+		order = keep[np.lexsort((-columns['bitscore'][keep],query_rank[columns['qseqid'][keep]]))]
 
-	return seq
+		rows = []
 
-def BLASTN(query,subject,outfile):
+		for column in HSP._fields:
+			values = columns[column][order].tolist()
+			if column in self.names:
+				decode = self.decode[column]
+				values = [decode[code] for code in values]
+			rows.append(values)
 
-	system(f"""
-		blastn \\
-		  -query {query} \\
-		  -subject {subject} \\
-		  -outfmt "6 qseqid sseqid length pident qstart qend qlen sstart send slen sstrand bitscore" \\
-		  -out {outfile} \\
-		  2>/dev/null
-	""")
-		#   -max_target_seqs 1 \\
+		for row in zip(*rows):
+			yield HSP(*row)
+
+def COLLINEAR_CHAIN(hsps):
+
+	## Indices, in contig order, of the best co-linear chain of HSPs: HSPs on the same
+	## reference sequence and strand, in the same order on the contig and the reference
+	## (reversed on the minus strand), with the highest total bitscore. Consecutive HSPs
+	## may overlap by up to CHAIN_OVERLAP bases. For each reference sequence and strand,
+	## this is a weighted longest increasing subsequence, solved in O(n log n) with a
+	## Fenwick tree holding the best chain ending before each reference position. Ties
+	## go to the first reference sequence, then the plus strand, then the first HSP.
+
+	groups = {}
+
+	for index,hsp in enumerate(hsps):
+		groups.setdefault((sseqid_index[hsp.sseqid],hsp.strand != 'plus'),[]).append(index)
+
+	best = None
+
+	for key in sorted(groups.keys()):
+
+		members = groups[key]
+
+		## Contig and reference intervals; minus strand reference coordinates are negated
+		## so that a chain is increasing on both
+		qstarts = [min(hsps[x].qstart,hsps[x].qend) for x in members]
+		qends = [max(hsps[x].qstart,hsps[x].qend) for x in members]
+		sstarts = [min(hsps[x].sstart,hsps[x].send) for x in members]
+		sends = [max(hsps[x].sstart,hsps[x].send) for x in members]
+
+		if key[1]:
+			sstarts,sends = [-x for x in sends],[-x for x in sstarts]
+
+		## An HSP can precede another starting at or after these positions
+		qlimits = [max(qends[x] - CHAIN_OVERLAP,qstarts[x] + 1) for x in range(len(members))]
+		slimits = [max(sends[x] - CHAIN_OVERLAP,sstarts[x] + 1) for x in range(len(members))]
+
+		keys = sorted(set(slimits))
+		tree = [(0,-1)]*(len(keys) + 1)
+
+		order = sorted(range(len(members)),key=lambda x: (qstarts[x],sstarts[x],x))
+		pending = sorted(range(len(members)),key=lambda x: (qlimits[x],x))
+
+		scores = [0]*len(members)
+		previous = [-1]*len(members)
+
+		inserted = 0
+
+		for current in order:
+
+			## HSPs ending before the current one on the contig become possible predecessors
+			while inserted < len(pending) and qlimits[pending[inserted]] <= qstarts[current]:
+				other = pending[inserted]
+				position = bisect_left(keys,slimits[other]) + 1
+				while position <= len(keys):
+					if (scores[other],-other) > (tree[position][0],-tree[position][1]):
+						tree[position] = (scores[other],other)
+					position += position & -position
+				inserted += 1
+
+			## Best chain among predecessors ending before the current one on the reference
+			score,other = 0,-1
+			position = bisect_right(keys,sstarts[current])
+			while position > 0:
+				if (tree[position][0],-tree[position][1]) > (score,-other):
+					score,other = tree[position]
+				position -= position & -position
+
+			scores[current] = score + hsps[members[current]].bitscore
+			previous[current] = other
+
+		last = max(range(len(members)),key=lambda x: (scores[x],-x))
+
+		if best is not None and scores[last] <= best[0]:
+			continue
+
+		best = (scores[last],[])
+
+		while last != -1:
+			best[1].append(members[last])
+			last = previous[last]
+
+	return best[1][::-1]
+
+def BLASTN(query,outfile,subject=None,db=None,threads=1):
+
+	## Yields the tabular lines of query against the reference as BLAST produces them;
+	## the raw table is kept in outfile. Raises BLASTError if blastn fails. A compressed
+	## query or a 2-bit sequence store is decompressed into the standard input of blastn.
+
+	stdin = query if is_compressed(query) or is_twobit(query) else None
+
+	command = ["blastn","-query","-" if stdin else query]
+
+	if db:
+		command += ["-db",db,"-num_threads",str(threads)]
+	else:
+		command += ["-subject",subject]
+
+	command += ["-outfmt","6 qseqid sseqid length pident qstart qend qlen sstart send slen sstrand bitscore"]
+
+	return stream_blast(command,outfile,stdin)
+
+def MINIMIZER_MAP(sequences):
+
+	## Maps contigs to the reference by chaining their minimizer seeds. Each chain is
+	## reported as an HSP in the tabular format of BLASTN, its identity estimated from the
+	## share s of the contig minimizers it spans that it matches, as s^(1/k). Returns these
+	## lines and the contigs to search with blastn: those without a chain of MIN_ANCHORS
+	## seeds, and those whose best chain is below the identity or alignment length
+	## thresholds, or overlaps another chain of similar size.
+
+	k = reference_index.k
+
+	lines = []
+	fallback = []
+
+	for qseqid in sorted(sequences.keys()):
+
+		sequence = sequences[qseqid]
+		qlen = len(sequence)
+
+		positions,hashes,strands = minimizers(sequence,k,reference_index.w)
+		qpos,targets,tpos,same,usable = reference_index.anchors(positions,hashes,strands)
+
+		if not len(qpos):
+			fallback.append(qseqid)
+			continue
+
+		chains = chain_anchors(qpos,targets,tpos,same)
+
+		## Anchors grouped by chain, along the query; seeds matching several times at
+		## the same query position are counted once
+		order = np.lexsort((qpos,chains))
+		chains = chains[order]
+		qpos = qpos[order]
+		tpos = tpos[order]
+
+		starts = np.flatnonzero(np.concatenate(([True],chains[1:] != chains[:-1])))
+		distinct = np.concatenate(([True],(chains[1:] != chains[:-1]) | (qpos[1:] != qpos[:-1])))
+
+		matched = np.add.reduceat(distinct.astype(np.int64),starts)
+		qmin = np.minimum.reduceat(qpos,starts)
+		qmax = np.maximum.reduceat(qpos,starts)
+		tmin = np.minimum.reduceat(tpos,starts)
+		tmax = np.maximum.reduceat(tpos,starts)
+		chain_targets = targets[order][starts]
+		chain_same = same[order][starts]
+
+		seeds = positions[usable]
+		spanned = np.searchsorted(seeds,qmax,'right') - np.searchsorted(seeds,qmin,'left')
+		pidents = 100 * (matched/np.maximum(spanned,1)) ** (1/k)
+
+		kept = np.flatnonzero(matched >= MIN_ANCHORS)
+
+		if not len(kept):
+			fallback.append(qseqid)
+			continue
+
+		kept = kept[np.argsort(-matched[kept],kind='stable')]
+		best = kept[0]
+
+		qspan = min(qmax[best] + k,qlen) - qmin[best]
+
+		ambiguous = False
+		for other in kept[1:]:
+			if matched[other] < AMBIGUITY*matched[best]:
+				break
+			overlap = min(qmax[best],qmax[other]) - max(qmin[best],qmin[other]) + k
+			if overlap >= 0.5*min(qspan,qmax[other] + k - qmin[other]):
+				ambiguous = True
+				break
+
+		if ambiguous or pidents[best] <= min_pident or qspan <= (max_overlp/100)*qlen:
+			fallback.append(qseqid)
+			continue
+
+		for index in kept:
+
+			sseqid = sseqids[chain_targets[index]]
+			slen = len(reference_seqs[sseqid])
+
+			qstart = qmin[index] + 1
+			qend = min(qmax[index] + k,qlen)
+			sstart = tmin[index] + 1
+			send = min(tmax[index] + k,slen)
+
+			length = max(qend - qstart,send - sstart) + 1
+
+			if chain_same[index]:
+				strand = 'plus'
+			else:
+				strand = 'minus'
+				sstart,send = send,sstart
+
+			lines.append(f"{qseqid}\t{sseqid}\t{length}\t{pidents[index]:.3f}\t{qstart}\t{qend}\t{qlen}\t{sstart}\t{send}\t{slen}\t{strand}\t{matched[index]}\n")
+
+	return lines,fallback
+
+def WRITE_REPORTS(report_dir,sseqids,assigned_locations,ref_assignment,qseqids,sequences,names=None):
+
+	## Writes all.map and links.txt in a single pass over the assignments, then karyotype.txt.
+	## Reference sequences are numbered in the order of sseqids, the references to which
+	## contigs are assigned (ref_assignment) are indices in sseqids, and names optionally
+	## gives the names under which the reference sequences are reported.
+
+	if names is None:
+		names = {sseqid:sseqid for sseqid in sseqids}
+
+	chromosomes = {sseqid:index+1 for index,sseqid in enumerate(sseqids)}
+	qseqid_index = {qseqid:index for index,qseqid in enumerate(qseqids)}
+
+	LINKS = open(f"{report_dir}/links.txt",'w',buffering=REPORT_BUFFER)
+	REF_MAP = open(f"{report_dir}/all.map",'w',buffering=REPORT_BUFFER)
+
+	REF_MAP.write("## >REFERENCE_HIT\tREFERENCE_LENGTH\n")
+	REF_MAP.write("##  >>FASTA_HIT\tALIGN_TYPE\tPIDENT\tFASTA_HIT_START\tFASTA_HIT_END\tFRACTION_FASTA_ALIGNED\tPERCENTAGE_FASTA_ALIGNED")
+	REF_MAP.write("\tREFERENCE_HIT_START\tREFERENCE_HIT_END\tFRACTION_REFERENCE_ALIGNED\tPERCENTAGE_REFERENCE_ALIGNED\n\n")
+
+	for ref_hit in sorted(assigned_locations.keys()):
+		
+		REF_MAP.write(f">>{names[ref_hit]}\t{len(reference_seqs[ref_hit])}\n")
+
+		chromosome = chromosomes[ref_hit]
+
+		## Ties are broken by contig and position so that the order of the contigs, on which
+		## assign_chromosome_number.py relies, does not depend on the order of the HSPs
+		for assignment in sorted(assigned_locations[ref_hit],key = lambda x: (x['sstart'],x['send'],qseqid_index[x['qseqid']],x['qstart'])):
+
+			pident = assignment['pident']
+
+			qseqid = assignment['qseqid']
+			qstart = assignment['qstart']
+			qend = assignment['qend']
+
+			sstart = assignment['sstart']
+			send = assignment['send']
+
+			qlen = assignment['qlen']
+			slen = assignment['slen']
+
+			length = assignment['length']
+
+			aligned_bases = abs(qend-qstart)+1
+			aligned_percent = aligned_bases/qlen*100
+
+			reference_covered = length/slen*100
+
+			contig = qseqid_index[qseqid] + 1
+
+			align_type = assignment['align_type']
+
+			if align_type == "Primary":
+
+				LINKS.write(f"chr{chromosome} {sstart} {send} con{contig} {qstart} {qend} color=0,255,255,.25,z=0\n")
+
+			else:
+
+				LINKS.write(f"chr{chromosome} {sstart} {send} con{contig} {qstart} {qend} color=255,0,255,.25,z=10\n")
+
+			REF_MAP.write(
+				f" >{qseqid}\t{align_type}\t{pident}%"
+				f"\t{qstart}\t{qend}\t{aligned_bases}/{qlen}\t{aligned_percent:.2f}%"
+				f"\t{sstart}\t{send}\t{length}/{slen}\t{reference_covered:.2f}%\n"
+			)
+
+		REF_MAP.write("\n")
+
+	REF_MAP.close()
+	LINKS.close()
+
+	KARYO = open(f"{report_dir}/karyotype.txt",'w',buffering=REPORT_BUFFER)
+
+	KARYO.write(f"# reference karyotype\n")
+	for index,key in enumerate(sseqids):
+		KARYO.write(f"chr - chr{index+1} {names[key]} 0 {len(reference_seqs[key])} chr1\n")
+
+	KARYO.write(f"\n# assembly karyotype\n")
+	for key in sorted(ref_assignment.keys(),key = lambda x: ref_assignment[x],reverse=True):
+		KARYO.write(f"chr - con{qseqid_index[key]+1} {key} 0 {len(sequences[key])} chr5\n")
+
+	KARYO.close()
 
 ############################################################
 ## Get sequences of REFERENCE assembly
 ############################################################
 
 reference_seqs = {}
-locus = False
-
-REF = open(ref,'r')
-for line in REF:
-	line = line.strip()
-	if line[0] == ">":
-		locus = line.split()[0][1:]
-		reference_seqs[locus] = ''
-	elif locus:
-		reference_seqs[locus] += line
-REF.close()
+
+## With several references, sequences are tagged with the name of their reference;
+## labels holds the reference and the original name of each tagged sequence
+labels = {}
+references = []
+
+for file in refs:
+
+	label = basename(strip_compression(file)).split(".")[0]
+
+	if label in references:
+		label = f"{label}_{len(references)+1}"
+
+	references.append(label)
+
+	for header,sequence in read_fasta(file):
+		sseqid = header.split()[0]
+		if len(refs) > 1:
+			labels[f"{label}:{sseqid}"] = (label,sseqid)
+			sseqid = f"{label}:{sseqid}"
+		reference_seqs[sseqid] = sequence
 
 sseqids = [x for x in sorted(reference_seqs.keys())]
+sseqid_index = {sseqid:index for index,sseqid in enumerate(sseqids)}
+
+ref = refs[0]
+ref_db = None
+
+## Directory of the BLAST database of the reference, if blastn needs one; the database itself
+## is built on first use by SEARCHED_DB
+db_dir = None
+
+if len(refs) > 1:
+
+	## Tagged sequences are written to a single FASTA, searched through one database
+	scratch = TemporaryDirectory()
+	ref = f"{scratch.name}/references.fasta"
+
+	REFERENCES = open(ref,'w')
+	for sseqid in sseqids:
+		write_fasta(REFERENCES,sseqid,reference_seqs[sseqid])
+	REFERENCES.close()
+
+	db_dir = cache if cache else scratch.name
+
+elif cache:
+	db_dir = cache
+
+elif is_compressed(ref) or is_twobit(ref) or batch:
+	## blastn cannot read a compressed or packed -subject, and a single search of all FASTA
+	## files is run with several threads against a database; the database is removed at exit
+	scratch = TemporaryDirectory()
+	db_dir = scratch.name
+
+def SEARCHED_DB():
+
+	## BLAST database searched by blastn, built the first time it is needed; None when blastn
+	## searches the reference FASTA directly
+
+	global ref_db
+
+	if db_dir and ref_db is None:
+		ref_db = REFERENCE_DB(ref,db_dir)
+
+	return ref_db
+
+reference_index = None
+
+if mapper == 'minimizer':
+	print(f"Indexing minimizers of {', '.join(refs)} (k = {kmer}, w = {window})")
+	reference_index = MinimizerIndex([reference_seqs[sseqid] for sseqid in sseqids],kmer,window)
 
 
 ############################################################
-## Iterate over provided FASTA files
+## Orient a FASTA file against the REFERENCE
 ############################################################
 
-if not isdir(outdir):
-	makedirs(outdir,mode=0o755)
+def ORIENT(file,results=None):
 
-for file in fastas:
+	## With results, the BLAST table of file was already produced by BATCH_BLAST
 
 	filename = basename(file).split(".")[0]
 
@@ -130,23 +741,9 @@ for file in fastas:
 	############################################################
 
 	sequences = {}
-	locus = False
-
-	FASTA = open(file,'r')
-	for line in FASTA:
-		
-		line = line.strip()
-
-		if line[0] == '>':
-			
-			locus = line[1:].split(" ")[0]
-			sequences[locus] = ""
-		
-		elif locus:
-
-			sequences[locus] += line
 
-	FASTA.close()
+	for header,sequence in read_fasta(file):
+		sequences[header.split(" ")[0]] = sequence
 
 	qseqids = [x for x in sorted(sequences.keys())]
 
@@ -163,107 +760,137 @@ for file in fastas:
 
 
 	############################################################
-	## Perform BLAST of FASTA vs REFERENCE
+	## Perform BLAST of FASTA vs REFERENCE, retrieving hits as
+	## they are reported
 	############################################################
 
-	BLASTN(query=file,subject=ref,outfile=f"{temp_dir}/results.blastn.6")
+	if results:
 
-	############################################################
-	## Retrieve BLAST hits between FASTA and REFERENCE
-	############################################################
+		RESULTS = open_file(results,'r')
+		hits = HitTable(RESULTS)
+		RESULTS.close()
 
-	hits = {}
+	elif mapper == 'minimizer':
 
-	BLAST = open(f"{temp_dir}/results.blastn.6",'r')
+		lines,fallback = MINIMIZER_MAP(sequences)
 
-	for line in BLAST:
+		RESULTS = open_file(f"{temp_dir}/results.minimizer.6{compressed}",'w')
+		RESULTS.writelines(lines)
+		RESULTS.close()
 
-		qseqid,sseqid,length,pident,qstart,qend,qlen,sstart,send,slen,strand,bitscore = line.strip().split("\t")
+		## Every contig is either placed by one of its chains or searched with blastn
+		print(f"Mapped {len(sequences) - len(fallback)} contig(s) with minimizers; {len(fallback)} left for blastn")
 
-		pident,qstart,qend,qlen,sstart,send,slen,length,bitscore = float(pident),int(qstart),int(qend),int(qlen),int(sstart),int(send),int(slen),int(length),float(bitscore)
+		if fallback:
 
-		if qseqid not in hits.keys():
+			query = f"{temp_dir}/fallback.fasta"
 
-			hits[qseqid] = []
+			FALLBACK = open(query,'w')
+			for qseqid in fallback:
+				write_fasta(FALLBACK,qseqid,sequences[qseqid],width)
+			FALLBACK.close()
 
-		hits[qseqid].append(
-			{
-				'bitscore':bitscore,
-				'pident':pident,
-				'sseqid':sseqid,
-				'length':length,
-				'qlen':qlen,
-				'qstart':qstart,
-				'qend':qend,
-				'slen':slen,
-				'sstart':sstart,
-				'send':send,
-				'strand':strand,
-			}
-		)
+			hits = HitTable(chain(lines,BLASTN(query=query,outfile=f"{temp_dir}/results.blastn.6{compressed}",subject=ref,db=SEARCHED_DB(),threads=threads)))
+
+			remove(query)
+
+		else:
+
+			hits = HitTable(lines)
 
-	BLAST.close()
+	else:
+
+		hits = HitTable(BLASTN(query=file,outfile=f"{temp_dir}/results.blastn.6{compressed}",subject=ref,db=SEARCHED_DB(),threads=threads))
 
 	orientations = {}
 	ref_assignment = {x:-1 for x in qseqids}
-	alignment = {}
 	assigned_locations = {}
 
-	for qseqid in sorted(hits.keys()):
+	## Identity and alignment length thresholds are applied to the whole table at once
+	for qseqid,results in groupby(hits.candidates(min_pident,max_overlp),key=attrgetter('qseqid')):
 
-		assigned_bps = {x:False for x in range(len(sequences[qseqid]))}
+		results = list(results)
 
-		for result in sorted(hits[qseqid],key=lambda x: x['bitscore'],reverse=True):
+		## The best co-linear chain decides the reference sequence, strand and position of
+		## the contig, and is reported as its Primary alignment
+		primary = COLLINEAR_CHAIN(results)
+		chained = [results[index] for index in primary]
 
-			sseqid = result['sseqid']
+		sseqid = chained[0].sseqid
+		strand = chained[0].strand
 
-			qstart = result['qstart']
-			qend = result['qend']
-			qlen = result['qlen']
+		orientations[qseqid] = strand
+		ref_assignment[qseqid] = sseqid_index[sseqid]
 
-			sstart = result['sstart']
-			send = result['send']
-			slen = result['slen']
+		assigned_bps = AssignedBases()
 
-			pident = result['pident']
-			length = result['length']
+		for result in chained:
+			assigned_bps.assign(result.qstart,result.qend)
 
-			strand = result['strand']
+		length = sum([result.length for result in chained])
+		pident = round(sum([result.pident*result.length for result in chained])/length,3)
 
-			occupied_count = 0
+		if sseqid not in assigned_locations.keys():
+			assigned_locations[sseqid] = []
 
-			for bp in range(qstart,qend):
-				
-				if assigned_bps[bp]:
-			
-					occupied_count += 1
+		assigned_locations[sseqid].append(
+			{
+				'qseqid':qseqid,
+				'align_type':'Primary',
+				'qstart':min([result.qstart for result in chained]),
+				'qend':max([result.qend for result in chained]),
+				'sstart':min([min(result.sstart,result.send) for result in chained]),
+				'send':max([max(result.sstart,result.send) for result in chained]),
+				'pident':pident,
+				'qlen':chained[0].qlen,
+				'slen':chained[0].slen,
+				'length':length,
+			}
+		)
+
+		## Off-chain HSPs are reported as Secondary alignments, by decreasing bitscore, if
+		## they do not overlap bases already assigned
+		primary = set(primary)
+
+		for index,result in enumerate(results):
+
+			if index in primary:
+				continue
+
+			sseqid = result.sseqid
+
+			qstart = result.qstart
+			qend = result.qend
+			qlen = result.qlen
+
+			sstart = result.sstart
+			send = result.send
+			slen = result.slen
 
-			if occupied_count < (min_palign/100)*length and pident > min_pident and (abs(qstart-qend)+1) > (max_overlp/100)*qlen:
+			pident = result.pident
+			length = result.length
 
-				for x in range(qstart,qend):
-					assigned_bps[x] = True
+			strand = result.strand
+
+			occupied_count = assigned_bps.occupied(qstart,qend)
+
+			if occupied_count < (min_palign/100)*length:
+
+				assigned_bps.assign(qstart,qend)
 
 				if sseqid not in assigned_locations.keys():
 					assigned_locations[sseqid] = []
 
-				if qseqid not in orientations.keys():
-					orientations[qseqid] = strand
-					ref_assignment[qseqid] = sseqids.index(sseqid)
-
 				if strand != 'plus':
 					sstart,send = send,sstart
 
 				if strand != orientations[qseqid]:
-					print("Inversion!")
 					qstart,qend = qend,qstart
 
-				if qseqid not in alignment.keys():
-
-					alignment[qseqid] = [qstart,qend]
-
 				assigned_locations[sseqid].append(
 					{
 						'qseqid':qseqid,
+						'align_type':'Secondary',
 						'qstart':qstart,
 						'qend':qend,
 						'sstart':sstart,
@@ -276,8 +903,8 @@ for file in fastas:
 				)
 
 
-	ORIENT = open(f"{temp_dir}/{filename}.oriented.fasta",'w')
-	UNMATCHED = open(f"{temp_dir}/{filename}.unmatched.fasta",'w')
+	ORIENT = open_file(f"{temp_dir}/{filename}.oriented.fasta{compressed}",'w')
+	UNMATCHED = open_file(f"{temp_dir}/{filename}.unmatched.fasta{compressed}",'w')
 
 	for qseqid in qseqids:
 		
@@ -287,95 +914,139 @@ for file in fastas:
 
 			if orientations[qseqid] == 'minus':
 		
-				seq = reverse_complement(seq)
+				seq = reverse_complement_chunks(seq)
 
-		seq = "\n".join(wrap(seq,60))
-		
 		if qseqid in orientations.keys():
 			
-			ORIENT.write(f">{qseqid}\n")
-			ORIENT.write(f"{seq}\n")
+			write_fasta(ORIENT,qseqid,seq,width)
 
 		else:
 
-			UNMATCHED.write(f">{qseqid}\n")
-			UNMATCHED.write(f"{seq}\n")
+			write_fasta(UNMATCHED,qseqid,seq,width)
 
 	ORIENT.close()
 	UNMATCHED.close()
 
 
-	LINKS = open(f"{temp_dir}/links.txt",'w')
-	REF_MAP = open(f"{temp_dir}/all.map",'w')
+	############################################################
+	## Write the reports, for all references together and, if
+	## there are several, for each reference
+	############################################################
 
-	REF_MAP.write("## >REFERENCE_HIT\tREFERENCE_LENGTH\n")
-	REF_MAP.write("##  >>FASTA_HIT\tALIGN_TYPE\tPIDENT\tFASTA_HIT_START\tFASTA_HIT_END\tFRACTION_FASTA_ALIGNED\tPERCENTAGE_FASTA_ALIGNED")
-	REF_MAP.write("\tREFERENCE_HIT_START\tREFERENCE_HIT_END\tFRACTION_REFERENCE_ALIGNED\tPERCENTAGE_REFERENCE_ALIGNED\n\n")
+	WRITE_REPORTS(temp_dir,sseqids,assigned_locations,ref_assignment,qseqids,sequences)
 
-	for ref_hit in sorted(assigned_locations.keys()):
-		
-		REF_MAP.write(f">>{ref_hit}\t{len(reference_seqs[ref_hit])}\n")
+	if len(refs) > 1:
 
-		for assignment in sorted(assigned_locations[ref_hit],key = lambda x: x['sstart']):
+		for label in references:
 
-			pident = assignment['pident']
+			report_dir = f"{temp_dir}/{label}"
 
-			qseqid = assignment['qseqid']
-			qstart = assignment['qstart']
-			qend = assignment['qend']
+			if not isdir(report_dir):
+				makedirs(report_dir,mode=0o755)
 
-			sstart = assignment['sstart']
-			send = assignment['send']
+			## Reference sequences are numbered within their reference, and contigs assigned
+			## to another reference are left unassigned
+			subset = [sseqid for sseqid in sseqids if labels[sseqid][0] == label]
+			subset_index = {sseqid_index[sseqid]:index for index,sseqid in enumerate(subset)}
 
-			qlen = assignment['qlen']
-			slen = assignment['slen']
+			WRITE_REPORTS(
+				report_dir,
+				subset,
+				{sseqid:assigned_locations[sseqid] for sseqid in subset if sseqid in assigned_locations},
+				{qseqid:subset_index.get(index,-1) for qseqid,index in ref_assignment.items()},
+				qseqids,
+				sequences,
+				names={sseqid:labels[sseqid][1] for sseqid in subset}
+			)
 
-			length = assignment['length']
+def BATCH_BLAST(files):
 
-			aligned_bases = abs(qend-qstart)+1
-			aligned_percent = aligned_bases/qlen*100
+	## Searches the sequences of all FASTA files with a single blastn: sequences are written
+	## to one query as <n>:<name>, n being the rank of their FASTA file, and the hits are
+	## split back into the results.blastn.6 file of each FASTA without the prefix. BLAST
+	## reports the hits of each query sequence independently of the others, so these are
+	## the tables that separate searches would produce. Returns the paths of these tables.
 
-			reference_covered = length/slen*100
+	print(f"\nSearching {len(files)} FASTA file(s) against {', '.join(refs)} with a single blastn\n")
 
-			REF_MAP.write(f" >{qseqid}")
+	query_dir = TemporaryDirectory()
+	query = f"{query_dir.name}/batch.fasta"
 
-			if qstart == alignment[qseqid][0] and qend == alignment[qseqid][-1]:
-				
-				REF_MAP.write(f"\tPrimary")
-				LINKS.write(f"chr{(sseqids.index(ref_hit))+1} {sstart} {send} con{(qseqids.index(qseqid))+1} {qstart} {qend} color=0,255,255,.25,z=0\n")
+	QUERY = open(query,'w')
+	for number,file in enumerate(files):
+		for header,sequence in read_fasta(file):
+			write_fasta(QUERY,f"{number}:{header.split(' ')[0]}",sequence)
+	QUERY.close()
 
-			else:
-				
-				REF_MAP.write(f"\tSecondary")
-				LINKS.write(f"chr{(sseqids.index(ref_hit))+1} {sstart} {send} con{(qseqids.index(qseqid))+1} {qstart} {qend} color=255,0,255,.25,z=10\n")
+	results = []
+	RESULTS = []
 
-			REF_MAP.write(f"\t{pident}%")
+	for file in files:
 
-			REF_MAP.write(f"\t{qstart}")
-			REF_MAP.write(f"\t{qend}")
-			
-			REF_MAP.write(f"\t{aligned_bases}/{qlen}")
-			REF_MAP.write(f"\t{aligned_percent:.2f}%")
+		temp_dir = f"{outdir}/{basename(file).split('.')[0]}"
 
-			REF_MAP.write(f"\t{sstart}")
-			REF_MAP.write(f"\t{send}")
+		if not isdir(temp_dir):
+			makedirs(temp_dir,mode=0o755)
 
-			REF_MAP.write(f"\t{length}/{slen}")
-			REF_MAP.write(f"\t{reference_covered:.2f}%\n")
+		results.append(f"{temp_dir}/results.blastn.6{compressed}")
+		RESULTS.append(open_file(results[-1],'w'))
 
+	for line in BLASTN(query=query,outfile=devnull,db=SEARCHED_DB(),threads=threads):
+		number,line = line.split(":",1)
+		RESULTS[int(number)].write(line)
 
-		REF_MAP.write("\n")
+	for RESULT in RESULTS:
+		RESULT.close()
 
-	REF_MAP.close()
-	LINKS.close()
+	query_dir.cleanup()
 
-	KARYO = open(f"{temp_dir}/karyotype.txt",'w')
+	return results
 
-	KARYO.write(f"# reference karyotype\n")
-	for index,key in enumerate(sorted(reference_seqs.keys())):
-		KARYO.write(f"chr - chr{index+1} {key} 0 {len(reference_seqs[key])} chr1\n")
+def ORIENT_QUIETLY(job):
 
-	KARYO.write(f"\n# assembly karyotype\n")
-	for key in sorted(ref_assignment.keys(),key = lambda x: ref_assignment[x],reverse=True):
-		index = qseqids.index(key)
-		KARYO.write(f"chr - con{index+1} {key} 0 {len(sequences[key])} chr5\n")
\ No newline at end of file
+	## Console output of a worker is held until its FASTA is done, so that messages
+	## from different FASTA files do not interleave
+
+	OUTPUT = StringIO()
+
+	with redirect_stdout(OUTPUT):
+		ORIENT(*job)
+
+	return OUTPUT.getvalue()
+
+
+############################################################
+## Iterate over provided FASTA files
+############################################################
+
+if not isdir(outdir):
+	makedirs(outdir,mode=0o755)
+
+try:
+
+	## With blastn as the mapper, the database is built once before the workers are forked
+	if mapper == 'blastn':
+		SEARCHED_DB()
+
+	if batch:
+		jobs_list = list(zip(fastas,BATCH_BLAST(fastas)))
+	else:
+		jobs_list = [(file,None) for file in fastas]
+
+	if jobs > 1 and len(fastas) > 1:
+
+		## Workers are forked once the REFERENCE is loaded, so they share reference_seqs
+		## and sseqids instead of each re-reading the reference
+		with get_context('fork').Pool(min(jobs,len(fastas))) as pool:
+			for output in pool.imap(ORIENT_QUIETLY,jobs_list):
+				print(output,end='',flush=True)
+
+	else:
+
+		for job in jobs_list:
+			ORIENT(*job)
+
+except BLASTError as error:
+
+	print(f"  [E] {error}")
+	exit(1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+name = 'parseTaxonomizedBLAST.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Parses the content of taxonomized BLAST searches. The BLAST tables are read once, keeping
+		only the best hit (highest bitscore within the evalue cutoff) of each query, and the
+		selected sequences are streamed from the FASTA files. A per-taxon summary of the best hits
+		is also written.
+
+REQUIRES	-outfmt '6 qseqid sseqid qstart qend pident length bitscore evalue staxids sscinames sskingdoms sblastnames'
+
+USAGE		{name} \\
+		  -b *.blastn.6 \\
+		  -f *.fasta \\
+		  -n Streptococcus 'Streptococcus suis' 'Streptococcus sp.' \\
+		  -e 1e-25 \\
+		  -o output.fasta \\
+		  -v
+
+OPTIONS
+-b (--blast)	BLAST input file(s)
+-f (--fasta)	FASTA file(s)
+-n (--name)	Names to be queried (case-insensitive regular expressions)
+-i (--inverse)	Returns queries NOT matching specified names
+-c (--column)	Which columns to query: sscinames, sskingdoms or sblastnames [Default: sscinames]
+-e (--evalue)	Evalue cutoff for target organism(s) [Default: 1e-10]
+-o (--output)	FASTA output file containing the desired sequences
+-s (--summary)	Per-taxon summary of the best hits [Default: output name with a .summary.tsv extension]
+-k (--keep)	Keep non-BLAST-match sequences
+-w (--width)	Line width of the output FASTA file [Default: 60]
+-v (--verbose)	Verbose [Default: off]
+
+NOTE		Input files can be gzip/bgzip-compressed, and the output FASTA is bgzip-compressed if
+		its name ends in .gz. Queries are identified by the first word of their FASTA header,
+		so these must be unique across the FASTA files.
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from re import compile,IGNORECASE
+from os.path import splitext
+from fasta_utilities import read_fasta,write_fasta
+from file_utilities import open_file,strip_compression
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-b","--blast",nargs='+',required=True)
+GetOptions.add_argument("-f","--fasta",nargs='+',required=True)
+GetOptions.add_argument("-n","--name",nargs='+',default=[])
+GetOptions.add_argument("-i","--inverse",default=False,action='store_true')
+GetOptions.add_argument("-c","--column",default='sscinames')
+GetOptions.add_argument("-e","--evalue",type=float,default=1e-10)
+GetOptions.add_argument("-o","--output",required=True)
+GetOptions.add_argument("-s","--summary",default=False)
+GetOptions.add_argument("-k","--keep",default=False,action='store_true')
+GetOptions.add_argument("-w","--width",type=int,default=60)
+GetOptions.add_argument("-v","--verbose",default=False,action='store_true')
+
+args = GetOptions.parse_args()
+
+blasts = args.blast
+fastas = args.fasta
+targets = args.name
+inverse = args.inverse
+column = args.column
+evalue = args.evalue
+output = args.output
+summary = args.summary
+keep = args.keep
+width = args.width
+verbose = args.verbose
+
+## Columns; [0] query, [1] target, [2] qstart, [3] qend, [4] pident, [5] length,
+## [6] bitscore, [7] evalue, [8] taxid, [9] sciname, [10] kingdom, [11] blastname
+columns = {
+	'sscinames': 9,
+	'sskingdoms': 10,
+	'sblastnames': 11,
+}
+
+if column not in columns:
+	print(f"  [E] Column name {column} is not recognised. Please use either sscinames, sskingdoms or sblastnames")
+	exit(1)
+
+if not summary:
+	summary = f"{splitext(strip_compression(output))[0]}.summary.tsv"
+
+## Names are matched anywhere in the column, ignoring case
+pattern = compile("|".join([f"(?:{target})" for target in targets]),IGNORECASE) if targets else None
+
+
+############################################################
+## Parsing BLAST 'outfmt 6' file(s)
+############################################################
+
+## Only the best hit of each query is kept while streaming through the tables:
+## query => [bitscore, taxon, line]
+best = {}
+
+for blast in blasts:
+
+	BLAST = open_file(blast,'r')
+
+	for line in BLAST:
+
+		if line.startswith("#") or not line.strip():
+			continue
+
+		data = line.rstrip("\n").split("\t")
+		query = data[0]
+		bitscore = float(data[6])
+
+		if float(data[7]) > evalue:
+			continue
+
+		## Checking for better hit(s) based on bitscores
+		if query not in best or bitscore > best[query][0]:
+			best[query] = [bitscore,data[columns[column]] if len(data) > columns[column] else "",line.rstrip("\n") if verbose else None]
+
+	BLAST.close()
+
+
+############################################################
+## Outputting sequences
+############################################################
+
+## Sequences are output based on BLAST name matches/non-matches, and if 'keep' is flagged,
+## sequences that have no BLAST results are also kept to prevent possible genetic information loss
+
+## taxon => [contigs, total bp, best bitscore]
+taxa = {}
+
+OUT = open_file(output,'w')
+
+for fasta in fastas:
+
+	for header,sequence in read_fasta(fasta):
+
+		query = header.split()[0]
+
+		if query in best:
+
+			bitscore,taxon,line = best[query]
+
+			if verbose:
+				print(f"Best hit for {query} = {taxon}")
+
+			matched = bool(pattern.search(taxon)) if pattern else False
+			selected = matched != inverse
+
+			if verbose and selected:
+				if matched:
+					print(f"Match found for {pattern.search(taxon).group(0)}: {line}")
+				else:
+					print(f"Match different from {', '.join(targets)}: {line}")
+
+		else:
+
+			bitscore,taxon = None,"No hit"
+			selected = keep
+
+		if taxon not in taxa:
+			taxa[taxon] = [0,0,bitscore]
+
+		taxa[taxon][0] += 1
+		taxa[taxon][1] += len(sequence)
+
+		if bitscore is not None and bitscore > taxa[taxon][2]:
+			taxa[taxon][2] = bitscore
+
+		if selected:
+			write_fasta(OUT,query,sequence,width)
+
+OUT.close()
+
+## Per-taxon breakdown of the best hits, largest first
+SUMMARY = open(summary,'w')
+SUMMARY.write(f"## {column}\tcontigs\ttotal_bp\tbest_bitscore\n")
+
+for taxon in sorted(taxa,key=lambda x: (-taxa[x][1],x)):
+	contigs,bp,bitscore = taxa[taxon]
+	bitscore = "NA" if bitscore is None else f"{bitscore:g}"
+	SUMMARY.write(f"{taxon}\t{contigs}\t{bp}\t{bitscore}\n")
+
+SUMMARY.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+name = 'prescreen_contigs.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Alignment-free pre-screen of assembled contigs before the taxonomized BLAST searches.
+		Minimizers of trusted genomes of the target organism are indexed, and contigs sharing
+		at least --min_containment of their minimizers with the index are classified as target.
+		Only the remaining contigs need to be searched against the NCBI databases.
+
+		Classified contigs are reported as taxonomized BLAST hits (outfmt 6 with staxids,
+		sscinames, sskingdoms and sblastnames), with the containment as percent identity and
+		the contig length as bitscore, so that the report can be given to parseTaxonomizedBLAST
+		together with the BLAST results of the remaining contigs.
+
+USAGE		{name} \\
+		  -f *.fasta \\
+		  -r reference.fasta \\
+		  -n 'Encephalitozoon intestinalis' \\
+		  -o PRESCREEN
+
+OPTIONS
+-f (--fasta)	FASTA file(s) to screen
+-r (--trusted)	FASTA file(s) of trusted genomes from the target organism
+-n (--name)	Scientific name reported for the target contigs
+-x (--taxid)	Taxid reported for the target contigs [Default: N/A]
+-g (--kingdom)	Kingdom reported for the target contigs [Default: N/A]
+-b (--blastname)	BLAST name reported for the target contigs [Default: N/A]
+-m (--min_containment)	Minimum fraction of contig minimizers found in the trusted genomes [Default: 0.8]
+-k (--kmer)	K-mer size, up to 31 [Default: 21]
+-s (--window)	Minimizer window, in k-mers [Default: 11]
+-w (--width)	Line width of output FASTA files [Default: 60]
+-z (--bgzip)	Write bgzip-compressed FASTA files
+-o (--outdir)	Output directory [Default: ./]
+
+OUTPUT		<prefix>.prescreen.6		Taxonomized hits of the contigs classified as target
+		<prefix>.prescreen.summary.tsv	Per-taxon summary, as in parseTaxonomizedBLAST
+		<prefix>.unclassified.fasta	Contigs to search with runTaxonomizedBLAST
+
+NOTE		Input FASTA files can be gzip/bgzip-compressed
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from os import makedirs
+from os.path import isdir,basename
+from fasta_utilities import read_fasta,write_fasta
+from file_utilities import open_file,strip_compression
+from kmer_utilities import minimizers,minimizer_set,containment
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-f","--fasta",nargs='+',required=True)
+GetOptions.add_argument("-r","--trusted",nargs='+',required=True)
+GetOptions.add_argument("-n","--name",required=True)
+GetOptions.add_argument("-x","--taxid",default='N/A')
+GetOptions.add_argument("-g","--kingdom",default='N/A')
+GetOptions.add_argument("-b","--blastname",default='N/A')
+GetOptions.add_argument("-m","--min_containment",type=float,default=0.8)
+GetOptions.add_argument("-k","--kmer",type=int,default=21)
+GetOptions.add_argument("-s","--window",type=int,default=11)
+GetOptions.add_argument("-w","--width",type=int,default=60)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
+GetOptions.add_argument("-o","--outdir",default='./')
+
+args = GetOptions.parse_args()
+
+fastas = args.fasta
+trusted = args.trusted
+taxon = [args.taxid,args.name,args.kingdom,args.blastname]
+min_containment = args.min_containment
+k = args.kmer
+window = args.window
+width = args.width
+compressed = ".gz" if args.bgzip else ""
+outdir = args.outdir
+
+if not 0 < k <= 31:
+	print(f"  [E] K-mer size must be between 1 and 31")
+	exit(1)
+
+if not isdir(outdir):
+	makedirs(outdir,mode=0o755)
+
+############################################################
+## Indexing trusted genomes
+############################################################
+
+print(f"Indexing minimizers of {', '.join(trusted)} (k = {k}, w = {window})")
+
+index = minimizer_set(trusted,k,window)
+
+print(f"  {len(index)} distinct minimizers")
+
+############################################################
+## Screening contigs
+############################################################
+
+for fasta in fastas:
+
+	filename = basename(strip_compression(fasta))
+	prefix = filename.rsplit(".",1)[0] if "." in filename else filename
+
+	print(f"Screening {fasta}")
+
+	classified = [0,0,0]
+	unclassified = [0,0]
+
+	HITS = open(f"{outdir}/{prefix}.prescreen.6",'w')
+	OUT = open_file(f"{outdir}/{prefix}.unclassified.fasta{compressed}",'w')
+
+	for header,sequence in read_fasta(fasta):
+
+		query = header.split()[0]
+		length = len(sequence)
+
+		fraction,shared = containment(minimizers(sequence,k,window)[1],index)
+
+		if fraction >= min_containment:
+			HITS.write("\t".join([query,"prescreen","1",str(length),f"{100*fraction:.3f}",str(length),str(length),"0.0"] + taxon) + "\n")
+			classified[0] += 1
+			classified[1] += length
+			classified[2] = max(classified[2],length)
+		else:
+			write_fasta(OUT,header,sequence,width)
+			unclassified[0] += 1
+			unclassified[1] += length
+
+	HITS.close()
+	OUT.close()
+
+	## Same layout as the per-taxon summary of parseTaxonomizedBLAST
+	SUMMARY = open(f"{outdir}/{prefix}.prescreen.summary.tsv",'w')
+	SUMMARY.write(f"## sscinames\tcontigs\ttotal_bp\tbest_bitscore\n")
+	if classified[0]:
+		SUMMARY.write(f"{args.name}\t{classified[0]}\t{classified[1]}\t{classified[2]}\n")
+	if unclassified[0]:
+		SUMMARY.write(f"Unclassified\t{unclassified[0]}\t{unclassified[1]}\tNA\n")
+	SUMMARY.close()
+
+	total = classified[1] + unclassified[1]
+	fraction = 100*unclassified[1]/total if total else 0
+
+	print(f"  {classified[0]} contig(s) classified as {args.name}; {unclassified[0]} contig(s) ({fraction:.1f}% of bases) left for BLAST")
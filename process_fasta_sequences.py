@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = 'process_fasta_sequences.py'
-version = '0.2.1'
-updated = '2023-04-25'
+version = '0.2.6'
+updated = '2026-10-18'
 
 usage = f"""
 NAME		{name}
@@ -23,6 +23,13 @@ OPTIONS
 -p (--prefix)	Prefix to give contigs [Default: contig_]
 -n (--min)	Minimum contig length [Default: 500]
 -x (--max)	Maximum contig length [Default: None]
+-w (--width)	Line width of output FASTA files [Default: 60]
+-z (--bgzip)	Write bgzip-compressed FASTA files
+-m (--low_memory)	Index the FASTA files and stream the kept sequences from disk instead of loading
+		them in memory; memory then depends on the number of sequences, not their size
+-s (--store)	Also write the processed sequences as a 2-bit sequence store (.a2bit)
+
+NOTE		Input FASTA files can be gzip/bgzip-compressed, or 2-bit sequence stores
 """
 
 from sys import argv
@@ -32,9 +39,12 @@ if len(argv) < 2:
 	exit()
 
 from argparse import ArgumentParser
-from textwrap import wrap
 from os.path import isdir, basename
-from os import makedirs
+from os import makedirs,remove
+from shutil import copyfileobj
+from fasta_utilities import read_fasta,write_fasta,index_fasta,read_record
+from file_utilities import open_file,is_compressed,is_twobit
+from twobit_utilities import write_twobit,TwoBitFile,EXTENSION
 
 GetOptions = ArgumentParser()
 
@@ -44,6 +54,10 @@ GetOptions.add_argument("-o","--outdir",default='processed_sequences')
 GetOptions.add_argument("-p","--prefix",default='contig_')
 GetOptions.add_argument("-n","--min",type=int,default=500)
 GetOptions.add_argument("-x","--max",type=int,default=False)
+GetOptions.add_argument("-w","--width",type=int,default=60)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
+GetOptions.add_argument("-m","--low_memory",default=False,action='store_true')
+GetOptions.add_argument("-s","--store",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
@@ -53,6 +67,10 @@ outdir = args.outdir
 prefix = args.prefix
 lmin = args.min
 lmax = args.max
+width = args.width
+compressed = ".gz" if args.bgzip else ""
+low_memory = args.low_memory
+store = args.store
 
 if not isdir(outdir):
 	makedirs(outdir,mode=0o755)
@@ -62,7 +80,8 @@ for file in fastas:
 	print(f"\tProcessing {file}")
 
 	sequences = {}
-	locus = False
+	records = {}
+	lengths = {}
 	filename = basename(file).split(".")[0]
 
 	temp_dir = f"{outdir}/{filename}"
@@ -70,45 +89,81 @@ for file in fastas:
 	if not isdir(temp_dir):
 		makedirs(temp_dir,mode=0o755)
 
-	IN = open(file,'r')
+	if low_memory:
+
+		## First pass: byte offsets and lengths of the records only. A compressed FASTA
+		## cannot be seeked into, so it is first decompressed next to the outputs.
+		fasta = file
+		packed = is_twobit(file)
+
+		if packed:
+
+			## A store is already indexed; records are read from it directly
+			STORE = TwoBitFile(file)
+			for entry in STORE.records:
+				records[entry[0]] = entry
+				lengths[entry[0]] = entry[1]
 
-	for line in IN:
-		
-		line = line.strip()
+		elif is_compressed(file):
+			fasta = f"{temp_dir}/.{filename}.fasta"
+			INPUT = open_file(file,'r')
+			COPY = open(fasta,'w')
+			copyfileobj(INPUT,COPY,1 << 24)
+			COPY.close()
+			INPUT.close()
 
-		if line[0] == '>':
-			
-			locus = line[1:]
-			sequences[locus] = ""
-		
-		elif locus:
+		if not packed:
+			for locus,start,end,length in index_fasta(fasta):
+				records[locus] = (start,end)
+				lengths[locus] = length
 
-			sequences[locus] += line
+	else:
 
-	IN.close()
+		for locus,sequence in read_fasta(file):
+			sequences[locus] = sequence
+			lengths[locus] = len(sequence)
 
 	keep = []
 	
-	for locus in sequences.keys():
+	for locus in lengths.keys():
 
-		if len(sequences[locus]) >= lmin:
+		if lengths[locus] >= lmin:
 			if lmax:
-				if len(sequences[locus]) <= lmax:
+				if lengths[locus] <= lmax:
 					keep.append(locus)
 			else:
 				keep.append(locus)
 
 	buffer = len(str(len(keep)))
 
-	OUT = open(f"{temp_dir}/{filename}.processed.fasta",'w')
+	if low_memory and not packed:
+		FASTA = open(fasta,'rb')
+
+	output = f"{temp_dir}/{filename}.processed.fasta{compressed}"
+	OUT = open_file(output,'w')
 	LOG = open(f"{temp_dir}/contig_name_links.tsv",'w')
 	LOG.write("## NEW_NAME\tOLD_NAME\n")
 	seq_count = 1
-	for key in sorted(keep,key=lambda x: len(sequences[x]),reverse=True):
-		OUT.write(f">{prefix}{seq_count:0{buffer}d}\n")
+	for key in sorted(keep,key=lambda x: lengths[x],reverse=True):
+		if low_memory and packed:
+			sequence = STORE.fetch(records[key])
+		elif low_memory:
+			## Second pass: kept records are streamed from their offsets
+			sequence = read_record(FASTA,*records[key])
+		else:
+			sequence = sequences[key]
+		write_fasta(OUT,f"{prefix}{seq_count:0{buffer}d}",sequence,width)
 		LOG.write(f"{prefix}{seq_count:0{buffer}d}\t{key}\n")
-		seq = "\n".join(wrap(sequences[key],60))
-		OUT.write(f"{seq}\n")
 		seq_count += 1
 	OUT.close()
 	LOG.close()
+
+	if low_memory and packed:
+		STORE.close()
+	elif low_memory:
+		FASTA.close()
+		if fasta != file:
+			remove(fasta)
+
+	if store:
+		write_twobit(f"{temp_dir}/{filename}.processed{EXTENSION}",read_fasta(output))
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = "prodigal_to_apollo_gff.py"
-version = "0.1.1"
-updated = "2023-05-20"
+version = "0.1.2"
+updated = "2026-10-18"
 
 usage = f"""
 NAME		{name}
@@ -14,7 +14,8 @@ USAGE		{name} \\
 		 -g 50507.prodigal.gff
 
 OPTIONS
-
+-g (--gff)	Prodigal gff file (can be gzip/bgzip-compressed)
+-z (--bgzip)	Write a bgzip-compressed GFF3 file
 """
 
 from sys import argv
@@ -25,19 +26,22 @@ if len(argv) < 2:
 
 from argparse import ArgumentParser
 from os.path import basename
+from file_utilities import open_file,strip_compression
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-g","--gff",required=True)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
 gff_file = args.gff
+compressed = ".gz" if args.bgzip else ""
 
-filename = ".".join(basename(gff_file).split(".")[0:-1])
+filename = ".".join(basename(strip_compression(gff_file)).split(".")[0:-1])
 
-GFF = open(gff_file,'r')
-AGFF = open(f"{filename}.apollo.gff3",'w')
+GFF = open_file(gff_file,'r')
+AGFF = open_file(f"{filename}.apollo.gff3{compressed}",'w')
 for line in GFF:
 	line = line.strip()
 	if line[0] == "#":
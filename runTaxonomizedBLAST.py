@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+name = 'runTaxonomizedBLAST.py'
+version = '0.2.2'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Runs taxonomized BLAST searches, and returns the outfmt 6 format with columns staxids, sscinames,
+		sskingdoms, and sblastnames. Each query FASTA is split into shards of similar total length that
+		are searched concurrently by several BLAST processes, and the shard results are merged back in
+		the original query order. Completed batches are kept until the merge, so an interrupted run
+		resumes where it stopped when the same command is run again (with the batches of the first
+		run, even if --jobs, --shards or --batch are changed).
+
+REQUIREMENTS	- BLAST 2.2.28+ or later
+		- NCBI taxonomony database (ftp://ftp.ncbi.nlm.nih.gov/blast/db/taxdb.tar.gz)
+		- NCBI NR/NT databases (ftp://ftp.ncbi.nlm.nih.gov/blast/db/)
+		- The BLASTDB variable must be set in the environmental variables:
+		  export BLASTDB=/path/to/NCBI/TaxDB:/path/to/NCBI/NR:/path/to/NCBI/NT
+
+USAGE		{name} \\
+		  -t 128 \\
+		  -j 16 \\
+		  -p blastn \\
+		  -a megablast \\
+		  -d nt \\
+		  -q *.fasta \\
+		  -e 1e-10 \\
+		  -c 1 \\
+		  -o RESULTS
+
+OPTIONS
+-p (--program)	BLAST type: blastn, blastp, blastx, tblastn or tblastx [Default: blastn]
+-a (--algo)	Blastn algorithm: blastn, dc-megablast, or megablast [Default: megablast]
+-t (--threads)	Total number of threads [Default: 16]
+-j (--jobs)	Number of concurrent BLAST processes; each uses threads/jobs threads [Default: 1]
+-s (--shards)	Number of shards per query FASTA [Default: same as --jobs]
+-b (--batch)	Split query FASTAs into batches of up to this many residues instead of --shards shards;
+		smaller batches lose less work when a run is interrupted
+-k (--keep)	Keep the completed batches after the final merge
+-q (--query)	FASTA file(s) to query
+-d (--db)	Database to query: nt, nr, or other [Default: nt]
+-e (--evalue)	Evalue cutoff [Default: 1e-05]
+-c (--culling)	Culling limit [Default: 1]
+-g (--gilist)	Restrict search to GI list
+-x (--taxids)	Restrict search to taxids from file ## one taxid per line
+-n (--ntaxids)	Exclude from search taxids from file ## one taxid per line
+-o (--outdir)	Output directory [Default: ./]
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from os import makedirs,rename,remove
+from os.path import isdir,isfile,basename
+from hashlib import sha256
+from shutil import rmtree
+from heapq import heappush,heappop,merge
+from concurrent.futures import ThreadPoolExecutor,as_completed
+from fasta_utilities import read_fasta,write_fasta
+from file_utilities import strip_compression
+from blast_utilities import run_blast,BLASTError
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-p","--program",default='blastn')
+GetOptions.add_argument("-a","--algo",default='megablast')
+GetOptions.add_argument("-t","--threads",type=int,default=16)
+GetOptions.add_argument("-j","--jobs",type=int,default=1)
+GetOptions.add_argument("-s","--shards",type=int,default=False)
+GetOptions.add_argument("-b","--batch",type=int,default=False)
+GetOptions.add_argument("-k","--keep",default=False,action='store_true')
+GetOptions.add_argument("-q","--query",nargs='+',required=True)
+GetOptions.add_argument("-d","--db",default='nt')
+GetOptions.add_argument("-e","--evalue",default='1e-05')
+GetOptions.add_argument("-c","--culling",type=int,default=1)
+GetOptions.add_argument("-g","--gilist",default=False)
+GetOptions.add_argument("-x","--taxids",default=False)
+GetOptions.add_argument("-n","--ntaxids",default=False)
+GetOptions.add_argument("-o","--outdir",default='./')
+
+args = GetOptions.parse_args()
+
+blast_type = args.program
+task = args.algo
+threads = args.threads
+jobs = max(1,args.jobs)
+shards = args.shards if args.shards else jobs
+batch_size = args.batch
+keep = args.keep
+queries = args.query
+db = args.db
+evalue = args.evalue
+culling = args.culling
+gi = args.gilist
+taxids = args.taxids
+ntaxids = args.ntaxids
+outdir = args.outdir
+
+if not isdir(outdir):
+	makedirs(outdir,mode=0o755)
+
+## Threads are split evenly between the concurrent BLAST processes
+shard_threads = max(1,threads//jobs)
+
+## Options shared by every search
+options = []
+
+if blast_type == 'blastn':
+	options += ["-task",task]
+
+if gi:
+	options += ["-gilist",gi]
+
+## Checking for taxonomic restrictions, if any
+## Useful to query a subset of the NCBI databases
+if taxids:
+	options += ["-taxidlist",taxids]
+elif ntaxids:
+	options += ["-negative_taxidlist",ntaxids]
+
+options += [
+	"-db",db,
+	"-evalue",evalue,
+	"-culling_limit",str(culling),
+	"-outfmt","6 qseqid sseqid qstart qend pident length bitscore evalue staxids sscinames sskingdoms sblastnames",
+]
+
+
+## Search parameters that change BLAST results; completed batches are only reused for
+## the same parameters. Restriction lists are identified by their content.
+parameters = [blast_type,db,evalue,str(culling),options[options.index("-outfmt")+1]]
+
+if blast_type == 'blastn':
+	parameters.append(task)
+
+for restriction in (gi,taxids,ntaxids):
+	if restriction:
+		RESTRICTION = open(restriction,'rb')
+		parameters.append(sha256(RESTRICTION.read()).hexdigest())
+		RESTRICTION.close()
+	else:
+		parameters.append("")
+
+parameters = "\t".join(parameters)
+
+
+############################################################
+## Useful functions
+############################################################
+
+def BATCHES(query,work_dir,count,batch_size):
+
+	## Splits a query FASTA into batches, either count shards of similar total length
+	## (longest sequences first to the lightest shard) or, if batch_size is given, runs of
+	## consecutive sequences of up to batch_size residues. Sequences keep their original
+	## order within a batch. Returns the batch files, the key of each batch (a hash of its
+	## sequences and of the search parameters) and the query order of the sequence IDs.
+
+	records = []
+	for header,sequence in read_fasta(query):
+		records.append((header,len(sequence)))
+
+	assignment = [0]*len(records)
+
+	if batch_size:
+
+		count = 1
+		total = 0
+
+		for index,(header,length) in enumerate(records):
+			if total and total + length > batch_size:
+				count += 1
+				total = 0
+			assignment[index] = count - 1
+			total += length
+
+	else:
+
+		count = max(1,min(count,len(records)))
+
+		load = [(0,shard) for shard in range(count)]
+
+		for index in sorted(range(len(records)),key=lambda x: records[x][1],reverse=True):
+			total,shard = heappop(load)
+			assignment[index] = shard
+			heappush(load,(total+records[index][1],shard))
+
+	files = [f"{work_dir}/batch_{batch+1}.fasta" for batch in range(count)]
+	BATCH_FILES = [open(file,'w') for file in files]
+
+	keys = [sha256(parameters.encode()) for batch in range(count)]
+
+	for index,(header,sequence) in enumerate(read_fasta(query)):
+		write_fasta(BATCH_FILES[assignment[index]],header,sequence)
+		keys[assignment[index]].update(f">{header}\n{sequence}\n".encode())
+
+	for BATCH_FILE in BATCH_FILES:
+		BATCH_FILE.close()
+
+	order = {}
+	for index,(header,length) in enumerate(records):
+		order.setdefault(header.split()[0],index)
+
+	return files,[key.hexdigest() for key in keys],order
+
+def BLAST(query,key):
+
+	## Results are written under a temporary name and moved into place before the
+	## completion marker is written, so that an interrupted search is never reused
+
+	outfile = f"{work_dir}/{key}.6"
+
+	if isfile(f"{outfile}.done") and isfile(outfile):
+		return False
+
+	run_blast([blast_type,"-num_threads",str(shard_threads),"-query",query] + options + ["-out",f"{outfile}.partial"])
+
+	rename(f"{outfile}.partial",outfile)
+
+	MARKER = open(f"{outfile}.done",'w')
+	MARKER.write(f"{parameters}\n")
+	MARKER.close()
+
+	return True
+
+def BLOCKS(outfile,order):
+
+	## Yields (query index,lines) for each query of a batch output. BLAST writes the hits of
+	## a query together, in the order of the queries in the batch.
+
+	qseqid = None
+	lines = []
+
+	RESULTS = open(outfile,'r')
+	for line in RESULTS:
+		current = line.split("\t",1)[0]
+		if current != qseqid:
+			if lines:
+				yield order[qseqid],lines
+			qseqid = current
+			lines = []
+		lines.append(line)
+	RESULTS.close()
+
+	if lines:
+		yield order[qseqid],lines
+
+
+############################################################
+## Running BLAST
+############################################################
+
+for query in queries:
+
+	filename = basename(strip_compression(query))
+	prefix = filename.rsplit(".",1)[0] if "." in filename else filename
+	outfile = f"{outdir}/{prefix}.{blast_type}.6"
+
+	## Completed batches are kept here until the final merge, so that an interrupted run
+	## only searches the missing batches when restarted
+	work_dir = f"{outdir}/.{prefix}.{blast_type}.batches"
+
+	if not isdir(work_dir):
+		makedirs(work_dir,mode=0o755)
+
+	## The partitioning of the queries is kept with the batches, so that a resumed run gets
+	## the same batches (and keys) whatever its --jobs, --shards or --batch
+	partition = f"batch {batch_size}" if batch_size else f"shards {shards}"
+
+	if isfile(f"{work_dir}/partition"):
+		PARTITION = open(f"{work_dir}/partition",'r')
+		recorded = PARTITION.read().strip()
+		PARTITION.close()
+		if recorded != partition:
+			print(f"  Resuming with the batches of the interrupted run ({recorded}) instead of {partition}")
+			partition = recorded
+	else:
+		PARTITION = open(f"{work_dir}/partition",'w')
+		PARTITION.write(f"{partition}\n")
+		PARTITION.close()
+
+	mode,value = partition.split(" ")
+
+	if mode == 'batch':
+		files,keys,order = BATCHES(query,work_dir,shards,int(value))
+	else:
+		files,keys,order = BATCHES(query,work_dir,int(value),False)
+
+	done = sum([isfile(f"{work_dir}/{key}.6.done") for key in keys])
+
+	print(f"Running {blast_type} on {query} against {db} as {len(files)} batch(es), {min(jobs,len(files))} at a time using {shard_threads} threads each. This might take a while...")
+
+	if done:
+		print(f"  Resuming: {done} of {len(files)} batch(es) already completed")
+
+	## On the first failure, batches that have not started yet are cancelled rather than
+	## searched in vain before the error is reported
+	pool = ThreadPoolExecutor(jobs)
+	searches = [pool.submit(BLAST,file,key) for file,key in zip(files,keys)]
+
+	for search in as_completed(searches):
+		try:
+			search.result()
+		except BLASTError as error:
+			pool.shutdown(wait=False,cancel_futures=True)
+			print(f"  [E] {error}")
+			exit(1)
+
+	pool.shutdown()
+
+	## Batch outputs are merged back in the original query order
+	OUT = open(outfile,'w')
+	for index,lines in merge(*[BLOCKS(f"{work_dir}/{key}.6",order) for key in keys],key=lambda x: x[0]):
+		OUT.writelines(lines)
+	OUT.close()
+
+	## The partitioning is only needed to resume an interrupted run; batches kept with --keep
+	## are still reused by later runs that split the queries the same way
+	if keep:
+		remove(f"{work_dir}/partition")
+	else:
+		rmtree(work_dir)
@@ -1,8 +1,8 @@
 #!/usr/bin/env	python3
 
 name = "size_sort_gff.py"
-version = "0.1.1"
-updated = "2023-05-20"
+version = "0.1.2"
+updated = "2026-10-18"
 
 usage = f"""
 NAME		{name}
@@ -19,6 +19,9 @@ OPTIONS
 -g (--gff)	gff file from gene prediction tool
 -a (--aa_len)	Protein length in amino-acids [Default: 60]
 -o (--outdir)	Output directory [Default = SIZE_SORTED_PROTEINS]
+-z (--bgzip)	Write bgzip-compressed gff files
+
+NOTE		The gff file can be gzip/bgzip-compressed
 """
 
 from sys import argv
@@ -31,27 +34,30 @@ if len(argv) < 2:
 from argparse import ArgumentParser
 from os import makedirs
 from os.path import isdir,basename
+from file_utilities import open_file
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-g","--gff",required=True)
 GetOptions.add_argument("-a","--aa_len",default=60,type=int)
 GetOptions.add_argument("-o","--outdir",default="SIZE_SORTED_PROTEINS")
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
 gff_file = args.gff
 aa_len = args.aa_len
 outdir = args.outdir
+compressed = ".gz" if args.bgzip else ""
 
 if not isdir(outdir):
 	makedirs(outdir,mode=0o755)
 
 filename = basename(gff_file).split(".")[0]
 
-GFF = open(gff_file,'r')
-LONG = open(f"{outdir}/{filename}.long.gff",'w')
-SHORT = open(f"{outdir}/{filename}.short.gff",'w')
+GFF = open_file(gff_file,'r')
+LONG = open_file(f"{outdir}/{filename}.long.gff{compressed}",'w')
+SHORT = open_file(f"{outdir}/{filename}.short.gff{compressed}",'w')
 
 for line in GFF:
 	line = line.strip()
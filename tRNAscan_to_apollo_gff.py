@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 name = 'tRNAscan_to_apollo_gff.py'
-version = '0.1.0'
-updated = '2023-05-20'
+version = '0.1.1'
+updated = '2026-10-18'
 
 usage = f"""
 NAME		{name}
@@ -13,7 +13,8 @@ SYNOPSIS	Converts tRNAscan-SE output files to Apollo compatible GFF format.
 USAGE	{name} -t 50507.tRNA
 
 OPTIONS
--t (--tRNA)	tRNAscan output file
+-t (--tRNA)	tRNAscan output file (can be gzip/bgzip-compressed)
+-z (--bgzip)	Write a bgzip-compressed GFF file
 """
 
 from sys import argv
@@ -24,18 +25,21 @@ if len(argv) < 2:
 
 from argparse import ArgumentParser
 from os.path import basename
+from file_utilities import open_file
 
 GetOptions = ArgumentParser()
 
 GetOptions.add_argument("-t","--tRNA",required=True)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
 
 args = GetOptions.parse_args()
 
 tRNA_file = args.tRNA
+compressed = ".gz" if args.bgzip else ""
 filename = basename(tRNA_file).split(".")[0]
 
-TRNA = open(tRNA_file,'r')
-GFF = open(f"{filename}.tRNA.gff",'w')
+TRNA = open_file(tRNA_file,'r')
+GFF = open_file(f"{filename}.tRNA.gff{compressed}",'w')
 INTRON = open(f"{filename}.tRNA.introns",'w')
 
 nucleotide = {'A':'U','C':'G','G':'C','T':'A'}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+name = 'twobit_to_fasta.py'
+version = '0.1.0'
+updated = '2026-10-18'
+
+usage = f"""
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Writes 2-bit sequence stores (.a2bit) back to FASTA, e.g. for external tools. Whole
+		stores, or only some sequences or regions, can be extracted.
+
+USAGE		{name} \\
+		  -s *.a2bit \\
+		  -r chr1 chr2:1001-2000 \\
+		  -o FASTA
+
+OPTIONS
+-s (--store)	2-bit sequence store(s)
+-r (--regions)	Sequences (first word of their header) or regions (name:start-end, 1-based and
+		inclusive) to extract [Default: all sequences]
+-w (--width)	Line width of output FASTA files [Default: 60]
+-z (--bgzip)	Write bgzip-compressed FASTA files
+-o (--outdir)	Output directory [Default: ./]
+"""
+
+from sys import argv
+
+if len(argv) < 2:
+	print(f"\n{usage}")
+	exit()
+
+from argparse import ArgumentParser
+from os import makedirs
+from os.path import isdir,basename
+from fasta_utilities import write_fasta
+from file_utilities import open_file
+from twobit_utilities import TwoBitFile
+
+GetOptions = ArgumentParser()
+
+GetOptions.add_argument("-s","--store",nargs='+',required=True)
+GetOptions.add_argument("-r","--regions",nargs='+',default=[])
+GetOptions.add_argument("-w","--width",type=int,default=60)
+GetOptions.add_argument("-z","--bgzip",default=False,action='store_true')
+GetOptions.add_argument("-o","--outdir",default='./')
+
+args = GetOptions.parse_args()
+
+stores = args.store
+regions = args.regions
+width = args.width
+compressed = ".gz" if args.bgzip else ""
+outdir = args.outdir
+
+if not isdir(outdir):
+	makedirs(outdir,mode=0o755)
+
+## Regions; [0] name, [1] start (0-based), [2] end (exclusive, None for the whole sequence)
+requested = []
+
+for region in regions:
+
+	if ":" in region and "-" in region.rsplit(":",1)[1]:
+		locus,span = region.rsplit(":",1)
+		start,end = span.split("-")
+		if not (start.isdigit() and end.isdigit()) or int(start) < 1 or int(end) < int(start):
+			print(f"  [E] Region {region} is not of the form name:start-end")
+			exit(1)
+		requested.append((locus,int(start)-1,int(end)))
+	else:
+		requested.append((region,0,None))
+
+for store in stores:
+
+	filename = basename(store)
+	prefix = filename.rsplit(".",1)[0] if "." in filename else filename
+
+	print(f"Extracting {store}")
+
+	STORE = TwoBitFile(store)
+	OUT = open_file(f"{outdir}/{prefix}.fasta{compressed}",'w')
+
+	if not requested:
+		for header,sequence in STORE:
+			write_fasta(OUT,header,sequence,width)
+
+	for locus,start,end in requested:
+
+		if locus not in STORE:
+			print(f"  {locus} not found in {store}, skipping")
+			continue
+
+		if end is None:
+			write_fasta(OUT,STORE.header(locus),STORE.sequence(locus),width)
+		else:
+			write_fasta(OUT,f"{locus}:{start+1}-{min(end,STORE.length(locus))}",STORE.sequence(locus,start,end),width)
+
+	OUT.close()
+	STORE.close()
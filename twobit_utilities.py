@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+## Shared 2-bit packed sequence store for the A2A scripts
+
+name = 'twobit_utilities.py'
+version = '0.1.1'
+updated = '2026-10-18'
+
+## Layout of a store (.a2bit), all integers little-endian:
+##   header:  magic (8 bytes), number of records (uint64), offset of the index (uint64)
+##   records: for each sequence, its bases packed 4 per byte (A=0, C=1, G=2, T=3, first
+##            base in the high bits), then its exceptions as runs of a non-ACGT character
+##            (N and other IUPAC codes, gaps) stored as starts (uint64), lengths (uint64)
+##            and characters (uint8), then its lowercase (soft-masked) runs as starts and
+##            lengths (uint64)
+##   index:   for each sequence, its header (uint32 size + UTF-8), length, offset of its
+##            packed bases, number and offset of its exception runs, number and offset of
+##            its lowercase runs (uint64 each)
+## Sequences are restored exactly, including IUPAC codes and case.
+
+from struct import pack,unpack_from,calcsize
+from mmap import mmap,ACCESS_READ
+import numpy as np
+from file_utilities import is_twobit,TWOBIT_MAGIC as MAGIC
+
+EXTENSION = '.a2bit'
+
+HEADER = '<8sQQ'
+ENTRY = '<6Q'
+
+## Characters to 2-bit codes; 4 marks characters kept as exceptions
+ENCODING = np.full(256,4,dtype=np.uint8)
+for code,base in enumerate(b'ACGT'):
+	ENCODING[base] = code
+
+## Packed bytes to their 4 bases
+DECODING = np.array([[b'ACGT'[(byte >> shift) & 3] for shift in (6,4,2,0)] for byte in range(256)],dtype=np.uint8)
+
+def runs(mask,values=None):
+
+	## Starts and lengths of the runs of True in a boolean array; with values, runs also
+	## end where the value changes
+
+	change = np.diff(mask.astype(np.int8),prepend=0,append=0)
+
+	if values is not None:
+		inside = np.flatnonzero(mask[1:] & mask[:-1] & (values[1:] != values[:-1])) + 1
+		starts = np.sort(np.concatenate((np.flatnonzero(change == 1),inside)))
+		ends = np.sort(np.concatenate((np.flatnonzero(change == -1),inside)))
+	else:
+		starts = np.flatnonzero(change == 1)
+		ends = np.flatnonzero(change == -1)
+
+	return starts.astype(np.uint64),(ends - starts).astype(np.uint64)
+
+def write_twobit(file,records):
+
+	## Writes (header,sequence) records, e.g. from read_fasta(), to a store. Records are
+	## packed one at a time; only the index is kept until the end.
+
+	OUT = open(file,'wb')
+	OUT.write(pack(HEADER,MAGIC,0,0))
+
+	index = []
+
+	for header,sequence in records:
+
+		characters = np.frombuffer(sequence.encode(),dtype=np.uint8)
+
+		lowercase = (characters >= 97) & (characters <= 122)
+		upper = np.where(lowercase,characters - 32,characters).astype(np.uint8)
+
+		codes = ENCODING[upper]
+		exceptions = codes == 4
+
+		packed = np.where(exceptions,0,codes).astype(np.uint8)
+		packed = np.concatenate((packed,np.zeros(-len(packed) % 4,dtype=np.uint8))).reshape(-1,4)
+		packed = (packed[:,0] << 6) | (packed[:,1] << 4) | (packed[:,2] << 2) | packed[:,3]
+
+		packed_offset = OUT.tell()
+		OUT.write(packed.astype(np.uint8).tobytes())
+
+		exception_starts,exception_lengths = runs(exceptions,upper)
+		exception_offset = OUT.tell()
+		OUT.write(exception_starts.tobytes())
+		OUT.write(exception_lengths.tobytes())
+		OUT.write(upper[exception_starts.astype(np.int64)].tobytes())
+
+		mask_starts,mask_lengths = runs(lowercase)
+		mask_offset = OUT.tell()
+		OUT.write(mask_starts.tobytes())
+		OUT.write(mask_lengths.tobytes())
+
+		index.append((header,len(characters),packed_offset,len(exception_starts),exception_offset,len(mask_starts),mask_offset))
+
+	index_offset = OUT.tell()
+
+	for header,*entry in index:
+		encoded = header.encode()
+		OUT.write(pack('<I',len(encoded)))
+		OUT.write(encoded)
+		OUT.write(pack(ENTRY,*entry))
+
+	OUT.seek(0)
+	OUT.write(pack(HEADER,MAGIC,len(index),index_offset))
+	OUT.close()
+
+class TwoBitFile:
+
+	## Memory-mapped store giving random access to its sequences without parsing them.
+	## Sequences are looked up by the first word of their header.
+
+	def __init__(self,file):
+
+		self.FILE = open(file,'rb')
+		self.data = mmap(self.FILE.fileno(),0,access=ACCESS_READ)
+
+		magic,count,offset = unpack_from(HEADER,self.data,0)
+
+		if magic != MAGIC:
+			raise ValueError(f"{file} is not an A2A 2-bit sequence store")
+
+		## Index entries in file order, and by name
+		self.records = []
+		self.entries = {}
+
+		for number in range(count):
+			size, = unpack_from('<I',self.data,offset)
+			header = bytes(self.data[offset+4:offset+4+size]).decode()
+			offset += 4 + size
+			entry = (header,) + unpack_from(ENTRY,self.data,offset)
+			offset += calcsize(ENTRY)
+			self.records.append(entry)
+			self.entries.setdefault(header.split()[0] if header.split() else header,entry)
+
+	def close(self):
+
+		self.data.close()
+		self.FILE.close()
+
+	def __enter__(self):
+
+		return self
+
+	def __exit__(self,*details):
+
+		self.close()
+
+	def __len__(self):
+
+		return len(self.records)
+
+	def __contains__(self,name):
+
+		return name in self.entries
+
+	def names(self):
+
+		return list(self.entries.keys())
+
+	def length(self,name):
+
+		return self.entries[name][1]
+
+	def header(self,name):
+
+		return self.entries[name][0]
+
+	def array(self,dtype,offset,count):
+
+		return np.frombuffer(self.data,dtype=dtype,count=count,offset=offset)
+
+	def sequence(self,name,start=0,end=None):
+
+		## Bases [start,end) of a sequence, as a string
+
+		return self.fetch(self.entries[name],start,end)
+
+	def fetch(self,entry,start=0,end=None):
+
+		header,length,packed_offset,exception_count,exception_offset,mask_count,mask_offset = entry
+
+		end = length if end is None else min(end,length)
+		start = max(0,min(start,end))
+
+		if start == end:
+			return ''
+
+		first = start // 4
+		last = (end + 3) // 4
+
+		bases = DECODING[self.array(np.uint8,packed_offset + first,last - first)].reshape(-1)
+		bases = bases[start - 4*first:end - 4*first].copy()
+
+		if exception_count:
+
+			starts = self.array(np.uint64,exception_offset,exception_count).astype(np.int64)
+			lengths = self.array(np.uint64,exception_offset + 8*exception_count,exception_count).astype(np.int64)
+			characters = self.array(np.uint8,exception_offset + 16*exception_count,exception_count)
+
+			self.apply(bases,start,end,starts,lengths,characters)
+
+		if mask_count:
+
+			starts = self.array(np.uint64,mask_offset,mask_count).astype(np.int64)
+			lengths = self.array(np.uint64,mask_offset + 8*mask_count,mask_count).astype(np.int64)
+
+			self.apply(bases,start,end,starts,lengths)
+
+		return bases.tobytes().decode()
+
+	def apply(self,bases,start,end,starts,lengths,characters=None):
+
+		## Overwrites bases with the exception runs overlapping [start,end), or lowercases
+		## them for mask runs (characters is None)
+
+		first = np.searchsorted(starts + lengths,start,'right')
+		last = np.searchsorted(starts,end,'left')
+
+		run_starts = np.maximum(starts[first:last],start) - start
+		run_lengths = np.minimum(starts[first:last] + lengths[first:last],end) - start - run_starts
+
+		positions = np.repeat(run_starts - np.cumsum(run_lengths) + run_lengths,run_lengths) + np.arange(run_lengths.sum())
+
+		if characters is None:
+			bases[positions] |= 0x20
+		else:
+			bases[positions] = np.repeat(characters[first:last],run_lengths)
+
+	def __iter__(self):
+
+		## (header,sequence) records in file order, as read_fasta() yields them
+
+		for entry in self.records:
+			yield entry[0],self.fetch(entry)
+
+def read_twobit(file):
+
+	STORE = TwoBitFile(file)
+
+	try:
+		for header,sequence in STORE:
+			yield header,sequence
+	finally:
+		STORE.close()